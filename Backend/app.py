@@ -1,24 +1,49 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory, session, url_for
-from pymongo import MongoClient
-from langchain_core.messages import HumanMessage, BaseMessage, AIMessage
-from langchain.chat_models import init_chat_model
+from flask import Flask, render_template, request, jsonify, send_from_directory, session, url_for, Response, stream_with_context, g
+from pymongo import MongoClient, ReturnDocument, UpdateOne, ReplaceOne
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
 from datetime import datetime, timezone
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.graph import START, StateGraph
-from langgraph.graph.message import add_messages
-from typing import Sequence
-from typing_extensions import Annotated, TypedDict
 import os
 from flask_cors import CORS
-from werkzeug.security import generate_password_hash, check_password_hash
 import re
-import math
-from math import radians, sin, cos, atan2, sqrt
+import io
+import json
+import gzip
+import time
+import zlib
+import base64
+import atexit
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.middleware.proxy_fix import ProxyFix
+from context_window import build_context, SUMMARY_PROMPT
+from indexes import ensure_indexes
+from response_cache import ResponseCache
+from fallback import FallbackEngine
+from triage import TriageClassifier
+from write_behind import WriteBehindQueue
+from micro_batch import MicroBatcher
+from resilience import CircuitBreaker, GuardedModel, iterate_with_deadline
+import metrics
+from metrics import phase, MongoCommandTimer, Gauge
+from auth import PasswordHasher, PasswordHasherBusy, Throttle, UserCache
+from log_setup import setup_logging, redact
+from geo import to_lon_lat_array, haversine_matrix, estimate_duration, nearest_indices, HospitalIndex
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+# Password hashes run in worker processes, forked here before the logging, Mongo and
+# model threads exist so that no child inherits a lock one of them was holding
+password_hasher = PasswordHasher(
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+    max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16")),
+    queue_timeout=float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "2")),
+    executor=os.getenv("PASSWORD_HASH_EXECUTOR", "process")
+)
+atexit.register(password_hasher.shutdown)
+password_hasher.start()
+
+# Set up logging: JSON records written from a background thread, level from LOG_LEVEL
+setup_logging(on_drop=metrics.log_records_dropped.inc)
 logger = logging.getLogger(__name__)
 
 # ----- Flask setup -----
@@ -38,6 +63,19 @@ app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['SESSION_COOKIE_SECURE'] = False
 
+# Number of reverse proxies (e.g. the Node proxy) in front of Flask whose X-Forwarded-For
+# is trusted; with 0, request.remote_addr is the socket peer and forwarded headers are ignored
+PROXY_HOPS = int(os.getenv("PROXY_HOPS", "0"))
+if PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_HOPS, x_proto=PROXY_HOPS)
+
+# Requests slower than this log their phase breakdown (0 disables slow-request sampling)
+SLOW_REQUEST_SECONDS = int(os.getenv("SLOW_REQUEST_MS", "0")) / 1000 or None
+
+@app.before_request
+def before_request():
+    g.trace = metrics.start_trace()
+
 # Add CORS headers to all responses
 @app.after_request
 def after_request(response):
@@ -45,175 +83,756 @@ def after_request(response):
     response.headers.add('Access-Control-Allow-Credentials', 'true')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Authorization, Accept')
     response.headers.add('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
+    
+    trace = g.get('trace')
+    if trace is not None:
+        method = request.method
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        finish = lambda: metrics.finish_trace(trace, method, route, response.status_code, SLOW_REQUEST_SECONDS)
+        if response.is_streamed:
+            # A streamed body (the model's reply, an export) runs after this hook, so
+            # the request is timed until the server closes the response instead
+            response.call_on_close(finish)
+        else:
+            finish()
     return response
 
 # ----- MongoDB Setup -----
-try:
-    client = MongoClient('mongodb://localhost:27017/', serverSelectionTimeoutMS=5000)
-    client.server_info()  # Force connection check
-    db = client['Chatbot']
-    chat_collection = db['Chats']
-    users_collection = db['Users']
-    logger.info("MongoDB connection successful")
-except Exception as e:
-    logger.error(f"MongoDB connection failed: {e}")
-    # Fallback to in-memory storage if MongoDB fails
-    chat_collection = None
-    users_collection = None
+# The collections stay None until connect_mongo() succeeds (see Startup below)
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
+client = None
+db = None
+chat_collection = None
+users_collection = None
+message_collection = None
+checkpoint_collection = None
+response_cache_collection = None
+# Guards publishing the collections against building the checkpointer that uses them
+startup_lock = threading.Lock()
 
 # ----- LangGraph initialization -----
 groq_api_key = os.getenv("GROQ_API_KEY")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
 langgraph_app = None
+model = None
+model_batcher = None
+model_guard = None
+memory = None
+
+def init_graph():
+    """Build the chat graph; until it exists, chats are answered by the fallback engine.
 
-if not groq_api_key:
-    logger.error("GROQ_API_KEY not found in environment variables")
-else:
+    LangChain, LangGraph and the Groq client are imported here rather than at module
+    import, so the server can start listening before they are loaded.
+    """
+    global langgraph_app, model, model_batcher, model_guard, memory
+    if not groq_api_key:
+        logger.error("GROQ_API_KEY not found in environment variables")
+        return
+    
     try:
-        model = init_chat_model("llama-3.1-8b-instant", model_provider="groq", api_key=groq_api_key)
+        from langchain.chat_models import init_chat_model
+        from langchain_core.messages import BaseMessage, SystemMessage
+        from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+        from langchain_core.runnables import RunnableConfig
+        from langgraph.graph import START, StateGraph
+        from typing import Sequence
+        from typing_extensions import TypedDict
+        from checkpointer import BoundedMongoSaver
+        
+        # Graph checkpoints are cached in memory with LRU/TTL eviction and written through to MongoDB
+        with startup_lock:
+            memory = BoundedMongoSaver(
+                collection=checkpoint_collection,
+                max_threads=int(os.getenv("CHECKPOINT_MAX_THREADS", "1000")),
+                max_bytes=int(os.getenv("CHECKPOINT_MAX_MB", "64")) * 1024 * 1024,
+                ttl_seconds=int(os.getenv("CHECKPOINT_TTL_SECONDS", "1800"))
+            )
+        
+        model = init_chat_model("llama-3.1-8b-instant", model_provider="groq", api_key=groq_api_key, timeout=LLM_TIMEOUT_SECONDS)
+        # Non-streaming calls that arrive within a few ms of each other are sent to the
+        # model together; streaming calls always go straight to the model
+        if os.getenv("MODEL_BATCH", "false").lower() == "true":
+            model_batcher = MicroBatcher(
+                model,
+                max_batch=int(os.getenv("MODEL_BATCH_SIZE", "8")),
+                window=int(os.getenv("MODEL_BATCH_WINDOW_MS", "5")) / 1000,
+                max_concurrency=int(os.getenv("MODEL_BATCH_CONCURRENCY", "0")) or None
+            )
+            atexit.register(model_batcher.close)
+
+        # Every model call gets a deadline and goes through a circuit breaker; with a
+        # backup model configured, slow non-streaming calls are also hedged
+        backup_model_name = os.getenv("LLM_BACKUP_MODEL")
+        backup_model = None
+        if backup_model_name:
+            backup_model = init_chat_model(backup_model_name, model_provider="groq", api_key=groq_api_key, timeout=LLM_TIMEOUT_SECONDS)
+        model_guard = GuardedModel(
+            model_batcher.invoke if model_batcher is not None else model.invoke,
+            CircuitBreaker(
+                failure_rate=float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5")),
+                min_calls=int(os.getenv("CIRCUIT_MIN_CALLS", "10")),
+                window_seconds=int(os.getenv("CIRCUIT_WINDOW_SECONDS", "60")),
+                open_seconds=int(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+            ),
+            timeout=LLM_TIMEOUT_SECONDS,
+            backup=backup_model.invoke if backup_model is not None else None,
+            hedge_delay=int(os.getenv("HEDGE_DELAY_MS", "2000")) / 1000,
+            hedge_percentile=float(os.getenv("HEDGE_PERCENTILE", "95")) / 100
+        )
         prompt_template = ChatPromptTemplate.from_messages([
             ("system",
              "You are a healthcare bot. Your job is to advice homely remedies to patients who contact you. If the query seems too serious you should advice to seek professional help."),
+            MessagesPlaceholder(variable_name="summary", optional=True),
             MessagesPlaceholder(variable_name="messages")
         ])
 
+        # messages is a plain (last value wins) channel rather than add_messages:
+        # every turn passes the complete, token-budgeted context, so the checkpointed
+        # thread never accumulates a second copy of the conversation.
         class State(TypedDict):
-            messages: Annotated[Sequence[BaseMessage], add_messages]
+            messages: Sequence[BaseMessage]
+            summary: str
 
         workflow = StateGraph(state_schema=State)
 
-        def call_model(state: State):
-            prompt = prompt_template.invoke({"messages": state["messages"]})
-            response = model.invoke(prompt)
-            return {"messages": [response]}
+        def call_model(state: State, config: RunnableConfig):
+            summary = state.get("summary")
+            prompt = prompt_template.invoke({
+                "summary": [SystemMessage(content=f"Summary of the earlier conversation: {summary}")] if summary else [],
+                "messages": state["messages"]
+            })
+            with phase("llm"):
+                if config["configurable"].get("batch"):
+                    response = model_guard.invoke(prompt)
+                else:
+                    # Streaming: tokens are emitted from this thread, so no racing here
+                    response = model_guard.call(model.invoke, prompt)
+            metrics.record_llm_usage(response)
+            return {"messages": list(state["messages"]) + [response]}
 
         workflow.add_node("model", call_model)
         workflow.add_edge(START, "model")
-        memory = MemorySaver()
         langgraph_app = workflow.compile(checkpointer=memory)
         logger.info("LangGraph initialization successful")
     except Exception as e:
         logger.error(f"LangGraph initialization failed: {e}")
 
+# ----- Response cache for context-free first messages -----
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1000")),
+    ttl_seconds=int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+    similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0")) or None,
+    collection=None
+)
+RESPONSE_CACHE_SHARED = os.getenv("RESPONSE_CACHE_SHARED", "false").lower() == "true"
+
+def is_context_free(state):
+    return len(state['messages']) == 1 and not state['summary']
+
 # ----- Fallback responses for when GROQ API is down -----
+fallback_engine = FallbackEngine(
+    os.getenv("FALLBACK_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fallback_rules.json"))
+)
+
 def get_fallback_response(user_input):
-    fallback_responses = {
-        "hello": "Hello! I'm HealthAssist. How can I help you today?",
-        "hi": "Hi there! What health concern would you like to discuss?",
-        "help": "I can provide home remedies and health advice. Please describe your symptoms.",
-        "fever": "For fever, try resting, drinking plenty of fluids, and taking acetaminophen or ibuprofen as directed. If fever persists above 103°F (39.4°C) or lasts more than 3 days, please consult a doctor.",
-        "headache": "For headaches, try resting in a quiet dark room, applying a cool compress, and staying hydrated. Over-the-counter pain relievers may help. If headaches are severe or frequent, consult a doctor.",
-        "cough": "For cough, try honey in warm tea, staying hydrated, and using a humidifier. If cough persists for more than a week or is accompanied by fever, see a doctor.",
-        "cold": "For cold symptoms, rest, drink fluids, use saline nasal spray, and consider over-the-counter cold remedies. If symptoms worsen or last more than 10 days, see a doctor.",
-        "sore throat": "For sore throat, try warm salt water gargles, honey lemon tea, and throat lozenges. If severe or accompanied by fever, see a doctor.",
-        "nausea": "For nausea, try ginger tea, small bland meals, and staying hydrated with clear fluids. If persistent or severe, consult a doctor.",
-        "emergency": "⚠️ This may be a medical emergency. Please call emergency services or go to the nearest hospital immediately."
-    }
+    metrics.fallbacks.inc()
+    return fallback_engine.match(user_input)
+
+# ----- Emergency triage ahead of the model -----
+# Messages that describe an emergency are answered at once from local rules,
+# without loading history or calling the model.
+TRIAGE_ENABLED = os.getenv("TRIAGE_ENABLED", "true").lower() == "true"
+# Also answer triaged messages with the model: inline when streaming, in the background otherwise
+TRIAGE_FOLLOW_UP = os.getenv("TRIAGE_FOLLOW_UP", "false").lower() == "true"
+
+triage = None
+if TRIAGE_ENABLED:
+    triage = TriageClassifier(
+        os.getenv("TRIAGE_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "triage_rules.json")),
+        model_path=os.getenv("TRIAGE_MODEL_PATH") or None,
+        model_threshold=float(os.getenv("TRIAGE_MODEL_THRESHOLD", "0.8"))
+    )
+
+follow_up_executor = None
+if TRIAGE_FOLLOW_UP:
+    follow_up_executor = ThreadPoolExecutor(
+        max_workers=int(os.getenv("TRIAGE_FOLLOW_UP_WORKERS", "4")),
+        thread_name_prefix="triage-follow-up"
+    )
+
+def triage_message(user_input):
+    """Return a TriageResult for an emergency message, else None."""
+    if triage is None:
+        return None
+    with phase("triage"):
+        alert = triage.classify(user_input)
+    if alert is not None:
+        metrics.triage_alerts.inc(category=alert.category, source=alert.source)
+    return alert
+
+def follow_up_after_triage(session_id, user_email, user_input, exclude):
+    """Answer a triaged message with the model as well, saved as a further bot message.
+
+    exclude holds the ids of the already saved triage turn, so the model sees the
+    conversation as it was before the message. Follow-ups bypass the response
+    cache: a reply to an emergency message must not be reused for anyone else.
+    """
+    if langgraph_app is None:
+        return
+    try:
+        answer = generate_bot_response(session_id, user_email, user_input, exclude, use_cache=False)
+        save_messages(session_id, [new_message('bot', answer, datetime.now(timezone.utc))], user_email)
+    except Exception as e:
+        logger.error(f"Triage follow-up failed: {e}")
+
+# ----- MongoDB helper functions -----
+# Messages are stored outside the session document, in fixed-size buckets keyed by
+# "<session_id>:<bucket>". Each message gets a per-session sequence number (seq),
+# allocated from the session's message_count, and lives in bucket seq // size.
+MESSAGE_BUCKET_SIZE = int(os.getenv("MESSAGE_BUCKET_SIZE", "50"))
+SESSION_TITLE_LENGTH = 60
+SESSION_SNIPPET_LENGTH = 100
+MESSAGE_PAGE_LIMIT = 200
+
+def bucket_id(session_id, bucket):
+    return f"{session_id}:{bucket}"
+
+def bucket_ids(session_id, start, end):
+    """Bucket ids covering sequence numbers start <= seq < end."""
+    if end <= start:
+        return []
+    return [bucket_id(session_id, b) for b in range(start // MESSAGE_BUCKET_SIZE, (end - 1) // MESSAGE_BUCKET_SIZE + 1)]
+
+def bucket_updates(session_id, messages):
+    by_bucket = {}
+    for msg in messages:
+        by_bucket.setdefault(msg["seq"] // MESSAGE_BUCKET_SIZE, []).append(msg)
     
-    user_input_lower = user_input.lower()
-    for keyword, response in fallback_responses.items():
-        if keyword in user_input_lower:
-            return response
+    # $addToSet rather than $push: a retried write finds its messages already
+    # there and adds nothing, so bucket writes are safe to repeat
+    return [
+        UpdateOne(
+            {"_id": bucket_id(session_id, bucket)},
+            {
+                "$addToSet": {"messages": {"$each": items}},
+                "$setOnInsert": {"session_id": session_id, "bucket": bucket}
+            },
+            upsert=True
+        )
+        for bucket, items in by_bucket.items()
+    ]
+
+def snippet(text, limit):
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + "…"
+
+def group_turns(batch):
+    """Group a write batch by session: [(session_id, messages, header update)].
+
+    The header update is a pipeline, so the session's sidebar summary (title from
+    the first user message, last snippet, message count) is kept current in the
+    same write that allocates sequence numbers.
+    """
+    sessions = {}
+    for session_id, messages, user_email in batch:
+        entry = sessions.setdefault(session_id, {"messages": [], "user_email": None})
+        entry["messages"].extend(messages)
+        entry["user_email"] = user_email or entry["user_email"]
     
-    return "I understand you're seeking health advice. Currently, I'm experiencing technical difficulties with my AI service. Please try again in a few moments, or describe your symptoms clearly and I'll provide general guidance based on common remedies."
+    grouped = []
+    for session_id, entry in sessions.items():
+        messages = entry["messages"]
+        first_question = next((msg["content"] for msg in messages if msg["sender"] == "user"), None)
+        header = {
+            "message_count": {"$add": [{"$ifNull": ["$message_count", 0]}, len(messages)]},
+            "last_updated": messages[-1]["timestamp"],
+            # $literal: chat text starting with "$" must not be read as a field path
+            "last_snippet": {"$literal": snippet(messages[-1]["content"], SESSION_SNIPPET_LENGTH)}
+        }
+        if first_question:
+            header["title"] = {"$ifNull": ["$title", {"$literal": snippet(first_question, SESSION_TITLE_LENGTH)}]}
+        if entry["user_email"]:
+            header["user_email"] = entry["user_email"]
+        grouped.append((session_id, messages, [{"$set": header}]))
+    return grouped
 
-# ----- MongoDB helper functions -----
-def save_message(session_id, message, sender):
+def sequence_messages(messages, header):
+    """Number messages from the message_count returned by their header update."""
+    first_seq = header["message_count"] - len(messages)
+    return [{**msg, "seq": first_seq + offset} for offset, msg in enumerate(messages)]
+
+def allocate_sequences(batch):
+    """Give every message in the batch that has no seq yet its sequence number, in place.
+
+    Each session's header is updated once for all of its unnumbered messages. A
+    message keeps its seq once allocated, so allocating a batch again (after a
+    failed bucket write) only numbers what is still missing and never advances
+    message_count twice for the same messages.
+    """
+    unnumbered = [(session_id, [msg for msg in messages if "seq" not in msg], user_email)
+                  for session_id, messages, user_email in batch]
+    for session_id, messages, update_data in group_turns([item for item in unnumbered if item[1]]):
+        header = chat_collection.find_one_and_update(
+            {"session_id": session_id},
+            update_data,
+            projection={"message_count": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        first_seq = header["message_count"] - len(messages)
+        for offset, msg in enumerate(messages):
+            msg["seq"] = first_seq + offset
+
+def append_batch(batch):
+    """Append messages for one or more sessions.
+
+    batch is a list of (session_id, messages, user_email). Sequence numbers are
+    allocated with one header update per session, then every bucket write goes
+    out in a single bulk_write. Both steps are safe to retry with the same batch.
+    """
+    allocate_sequences(batch)
+    operations = []
+    for session_id, messages, _ in batch:
+        operations.extend(bucket_updates(session_id, messages))
+    
+    if operations:
+        message_collection.bulk_write(operations, ordered=False)
+
+def select_messages(bucket_docs, start, end):
+    """Messages with start <= seq < end from a set of bucket documents, in order."""
+    messages = [
+        msg
+        for doc in bucket_docs
+        for msg in doc.get("messages", [])
+        if start <= msg["seq"] < end
+    ]
+    messages.sort(key=lambda msg: msg["seq"])
+    return messages
+
+def load_messages(session_id, start, end):
+    """Return messages with start <= seq < end, reading only the buckets that hold them."""
+    ids = bucket_ids(session_id, start, end)
+    if not ids:
+        return []
+    return select_messages(message_collection.find({"_id": {"$in": ids}}, {"messages": 1}), start, end)
+
+def migrate_embedded_messages(database):
+    """Move messages still embedded in legacy Chats documents into buckets.
+
+    Each session is claimed with one atomic update that removes its embedded messages
+    and sets message_count, so processes starting together never migrate the same
+    session twice, and appends arriving meanwhile are numbered after the legacy messages.
+    """
+    migrated = 0
+    while True:
+        chat = database['Chats'].find_one_and_update(
+            {"messages": {"$exists": True}},
+            [
+                {"$set": {"message_count": {"$size": {"$ifNull": ["$messages", []]}}}},
+                {"$project": {"messages": 0}}
+            ],
+            projection={"session_id": 1, "messages": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if chat is None:
+            break
+        legacy = [{**msg, "seq": seq} for seq, msg in enumerate(chat.get("messages") or [])]
+        if legacy:
+            try:
+                database['Messages'].bulk_write(bucket_updates(chat["session_id"], legacy))
+            except Exception:
+                # Put the messages back so the next startup retries this session
+                database['Chats'].update_one({"_id": chat["_id"]}, {"$set": {"messages": chat["messages"]}})
+                raise
+        migrated += 1
+    if migrated:
+        logger.info("Migrated %d sessions to bucketed message storage", migrated)
+
+# Optional write-behind queue: chat turns are written in batches off the request path
+write_queue = None
+if os.getenv("WRITE_BEHIND", "false").lower() == "true":
+    write_queue = WriteBehindQueue(
+        append_batch,
+        max_batch=int(os.getenv("WRITE_BEHIND_BATCH", "100")),
+        flush_interval=int(os.getenv("WRITE_BEHIND_INTERVAL_MS", "50")) / 1000,
+        max_backlog=int(os.getenv("WRITE_BEHIND_MAX_BACKLOG", "10000"))
+    )
+    atexit.register(write_queue.close)
+
+def new_message(sender, content, timestamp):
+    # ObjectIds are unique across processes even within the same microsecond
+    return {"_id": str(ObjectId()), "sender": sender, "content": content, "timestamp": timestamp}
+
+def turn_messages(user_input, bot_response, received_at):
+    messages = [new_message('user', user_input, received_at)]
+    if bot_response:
+        messages.append(new_message('bot', bot_response, datetime.now(timezone.utc)))
+    return messages
+
+def save_turn(session_id, user_email, user_input, bot_response, received_at):
+    """Persist a user message and the bot reply together; returns the saved messages."""
+    messages = turn_messages(user_input, bot_response, received_at)
+    save_messages(session_id, messages, user_email)
+    return messages
+
+def save_messages(session_id, messages, user_email):
     if chat_collection is None:
         logger.warning("MongoDB not available, message not saved")
         return
     
-    user_email = session.get('user_email')
-    message_data = {
-        "_id": datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S%f"),
-        "sender": sender, 
-        "content": message, 
-        "timestamp": datetime.now(timezone.utc)
-    }
-    
-    update_data = {
-        "$push": {"messages": message_data},
-        "$set": {"last_updated": datetime.now(timezone.utc)}
+    if write_queue is not None and write_queue.submit(session_id, messages, user_email):
+        return
+    try:
+        with phase("save"):
+            append_batch([(session_id, messages, user_email)])
+    except Exception as e:
+        logger.error(f"Failed to save messages: {e}")
+
+def pending_messages(session_id):
+    return write_queue.pending_messages(session_id) if write_queue is not None else []
+
+def split_pending(pending, stored):
+    """Split queued messages into (numbered, queued) against the header's message_count.
+
+    Numbered ones already have a seq below stored, so readers find them in their
+    bucket once the bucket write lands; the rest follow the stored messages.
+    """
+    numbered, queued = [], []
+    for msg in pending:
+        seq = msg.get("seq")
+        (numbered if seq is not None and seq < stored else queued).append(msg)
+    return numbered, queued
+
+def merge_pending(pending, loaded, stored, start, end):
+    """Messages with start <= seq < end from storage (loaded) and queued writes (pending).
+
+    Take the pending snapshot before reading the header and buckets: a message
+    written in between is then found in storage, and is dropped from the snapshot
+    by _id here, rather than being shown twice or not at all.
+    """
+    numbered, queued = split_pending(pending, stored)
+    loaded_ids = {msg["_id"] for msg in loaded}
+    messages = loaded + [
+        msg for msg in numbered
+        if start <= msg["seq"] < min(end, stored) and msg["_id"] not in loaded_ids
+    ]
+    messages.sort(key=lambda msg: msg["seq"])
+    messages += [{**msg, "seq": stored + i} for i, msg in enumerate(queued)][max(start - stored, 0):max(end - stored, 0)]
+    return messages
+
+SESSION_PAGE_LIMIT = 100
+SESSION_SUMMARY_FIELDS = {"_id": 0, "session_id": 1, "last_updated": 1, "title": 1, "message_count": 1, "last_snippet": 1}
+
+def session_summary(doc):
+    return {
+        "session_id": doc['session_id'],
+        "last_updated": doc['last_updated'].strftime("%Y-%m-%d %H:%M:%S"),
+        "title": doc.get('title'),
+        "message_count": doc.get('message_count', 0),
+        "last_snippet": doc.get('last_snippet')
     }
-    
-    if user_email:
-        update_data["$set"]["user_email"] = user_email
-    
+
+def encode_session_cursor(doc):
+    position = json.dumps([doc['last_updated'].isoformat(), doc['session_id']])
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+def decode_session_cursor(cursor):
+    """Return (last_updated, session_id) from a cursor; raises ValueError if malformed."""
     try:
-        chat_collection.update_one(
-            {"session_id": session_id},
-            update_data,
-            upsert=True
-        )
+        last_updated, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(last_updated), str(session_id)
     except Exception as e:
-        logger.error(f"Failed to save message: {e}")
+        raise ValueError(f"Invalid cursor: {e}")
 
-def get_sessions():
+def get_sessions(cursor=None, limit=None):
+    """Return a page of the user's sessions, most recently updated first, and the next cursor.
+
+    Pages are keyset-paginated on (last_updated, session_id); cursor is the value
+    returned with the previous page. All sessions are returned when limit is None.
+    """
     if chat_collection is None:
-        return []
+        return [], None
     
     user_email = session.get('user_email')
     query = {"user_email": user_email} if user_email else {}
+    if cursor is not None:
+        last_updated, session_id = decode_session_cursor(cursor)
+        query["$or"] = [
+            {"last_updated": {"$lt": last_updated}},
+            {"last_updated": last_updated, "session_id": {"$lt": session_id}}
+        ]
     
     try:
-        sessions = chat_collection.find(query, {"session_id": 1, "last_updated": 1, "_id": 0}).sort("last_updated", -1)
-        return [{"session_id": doc['session_id'], "last_updated": doc['last_updated'].strftime("%Y-%m-%d %H:%M:%S")} for doc in sessions]
+        docs = chat_collection.find(query, SESSION_SUMMARY_FIELDS).sort([("last_updated", -1), ("session_id", -1)])
+        if limit is not None:
+            docs = list(docs.limit(limit + 1))
+            if len(docs) > limit:
+                return [session_summary(doc) for doc in docs[:limit]], encode_session_cursor(docs[limit - 1])
+        return [session_summary(doc) for doc in docs], None
     except Exception as e:
         logger.error(f"Failed to get sessions: {e}")
-        return []
+        return [], None
+
+def get_sessions_version(user_email):
+    """A token that changes whenever the user's session list does, or None.
 
-def get_messages_for_session(session_id):
+    Any write bumps the latest last_updated and a deletion changes the count;
+    both are answered from the user_email index without reading session documents.
+    """
     if chat_collection is None:
-        return []
-    
-    user_email = session.get('user_email')
+        return None
+    try:
+        latest = chat_collection.find_one(
+            {"user_email": user_email}, {"_id": 0, "last_updated": 1}, sort=[("last_updated", -1)]
+        )
+        count = chat_collection.count_documents({"user_email": user_email})
+    except Exception as e:
+        logger.error(f"Failed to get sessions version: {e}")
+        return None
+    latest_ms = int(latest['last_updated'].replace(tzinfo=timezone.utc).timestamp() * 1000) if latest else 0
+    return f"{count}-{latest_ms}"
+
+def get_session_header(session_id, user_email, fields):
     query = {"session_id": session_id}
     if user_email:
         query["user_email"] = user_email
+    return chat_collection.find_one(query, {"_id": 0, "message_count": 1, **{field: 1 for field in fields}})
+
+def get_messages_for_session(session_id, user_email, before=None, limit=None):
+    """Return a page of messages, oldest first, and the cursor for the previous page.
+
+    before is an exclusive sequence-number cursor; the page holds the newest
+    messages before it (all of them when limit is None). The returned cursor is
+    None once the start of the session is reached.
+    """
+    if chat_collection is None:
+        return [], None
     
     try:
-        chat = chat_collection.find_one(query, {"_id": 0, "messages": 1})
-        return chat.get("messages", []) if chat else []
+        # Turns still queued for write-behind; see merge_pending for why this comes first
+        pending = pending_messages(session_id)
+        chat = get_session_header(session_id, user_email, [])
+        if not chat:
+            return [], None
+        
+        stored = chat.get("message_count", 0)
+        end = stored + len(split_pending(pending, stored)[1])
+        if before is not None:
+            end = min(before, end)
+        start = max(end - limit, 0) if limit is not None else 0
+        messages = merge_pending(pending, load_messages(session_id, start, min(end, stored)), stored, start, end)
+        return messages, (start if start > 0 else None)
     except Exception as e:
         logger.error(f"Failed to get messages: {e}")
-        return []
+        return [], None
+
+def get_session_context(session_id, user_email):
+    """Return (messages, summary, offset) for a session.
+
+    Only the buckets after the part of the conversation already folded into the
+    summary are read; offset is the sequence number of the first returned message.
+    """
+    if chat_collection is None:
+        return [], None, 0
+    
+    try:
+        pending = pending_messages(session_id)
+        chat = get_session_header(session_id, user_email, ["summary"])
+        if not chat:
+            return [], None, 0
+        
+        summary = chat.get("summary")
+        offset = summary.get("covered", 0) if summary else 0
+        stored = chat.get("message_count", 0)
+        messages = merge_pending(pending, load_messages(session_id, offset, stored), stored, offset, stored + len(pending))
+        return messages, summary, offset
+    except Exception as e:
+        logger.error(f"Failed to get session context: {e}")
+        return [], None, 0
+
+def save_session_summary(session_id, summary):
+    if chat_collection is None:
+        return
+    
+    try:
+        chat_collection.update_one({"session_id": session_id}, {"$set": {"summary": summary}})
+    except Exception as e:
+        logger.error(f"Failed to save session summary: {e}")
+
+def summarize_history(summary_text, transcript):
+    from langchain_core.messages import HumanMessage, SystemMessage
+    
+    with phase("summary"):
+        response = model_guard.invoke([
+            SystemMessage(content=SUMMARY_PROMPT),
+            HumanMessage(content=f"Existing summary:\n{summary_text or '(none)'}\n\nNew conversation:\n{transcript}")
+        ])
+    metrics.record_llm_usage(response)
+    return response.content
+
+def make_graph_state(session_id, previous_messages, summary, offset, user_input):
+    """Turn stored context into graph input: recent turns verbatim plus a running summary.
 
-def generate_bot_response(session_id, user_input):
+    Returns (state, summary); summary is None unless it changed and should be saved.
+    May call the model to fold older turns into the summary.
+    """
+    from langchain_core.messages import HumanMessage, AIMessage
+    
+    previous_messages = previous_messages + [{"sender": "user", "content": user_input}]
+    summary, recent, changed = build_context(
+        previous_messages, summary,
+        summarize=summarize_history if langgraph_app is not None else None,
+        offset=offset
+    )
+    
+    history = []
+    for msg in recent:
+        content = msg.get('content') or msg.get('messages')
+        if content:
+            if msg['sender'] == 'user':
+                history.append(HumanMessage(content=content))
+            else:
+                history.append(AIMessage(content=content))
+    
+    logger.debug("History for session %s: %d messages, summary covers %d", session_id, len(history), summary['covered'])
+    return {'messages': history, 'summary': summary['text']}, (summary if changed else None)
+
+def build_history(session_id, user_email, user_input, exclude=()):
+    """Build the graph input for the next turn of a session, leaving out messages whose _id is in exclude."""
+    with phase("history"):
+        previous_messages, summary, offset = get_session_context(session_id, user_email)
+    if exclude:
+        previous_messages = [msg for msg in previous_messages if msg.get("_id") not in exclude]
+    with phase("prompt"):
+        state, new_summary = make_graph_state(session_id, previous_messages, summary, offset, user_input)
+    if new_summary is not None:
+        save_session_summary(session_id, new_summary)
+    return state
+
+def format_bot_text(text):
+    return text.replace("\u2022", "\n•")
+
+def generate_bot_response(session_id, user_email, user_input, exclude=(), use_cache=True):
     if langgraph_app is None:
         logger.warning("Using fallback response system")
         return get_fallback_response(user_input)
     
     try:
-        previous_messages = get_messages_for_session(session_id)
-        history = []
-        
-        for msg in previous_messages:
-            content = msg.get('content') or msg.get('messages')
-            if content:
-                if msg['sender'] == 'user':
-                    history.append(HumanMessage(content=content))
-                else:
-                    history.append(AIMessage(content=content))
-        
-        history.append(HumanMessage(content=user_input))
-        logger.debug(f"History for session {session_id}: {len(history)} messages")
-        
-        state = {'messages': history}
+        state = build_history(session_id, user_email, user_input, exclude)
+        cacheable = use_cache and is_context_free(state)
+        if cacheable:
+            cached = response_cache.get(user_input)
+            if cached is not None:
+                logger.debug("Response cache hit")
+                return cached
         
         response = langgraph_app.invoke(
             state,
-            config={"configurable": {"thread_id": session_id}}
+            config={"configurable": {"thread_id": session_id, "batch": True}}
         )
         
         answer = response['messages'][-1].content if response['messages'] else "No response"
-        formatted_answer = answer.replace("\u2022", "\n•")
-        logger.debug(f"Bot response generated: {formatted_answer[:100]}...")
+        formatted_answer = format_bot_text(answer)
+        if cacheable and response['messages']:
+            response_cache.put(user_input, formatted_answer)
+        logger.debug("Bot response generated: %s", redact(formatted_answer))
         return formatted_answer
     
     except Exception as e:
         logger.error(f"Error generating bot response: {e}")
         return get_fallback_response(user_input)
 
+def stream_bot_response(session_id, user_email, user_input, exclude=(), use_cache=True):
+    """Yield the bot reply in chunks as the model produces them.
+
+    Falls back to a single fallback chunk if the model is unavailable or
+    fails before producing any output. A reply still streaming after
+    LLM_TIMEOUT_SECONDS is cut off and the fallback is appended. use_cache=False
+    neither reads nor writes the response cache.
+    """
+    if langgraph_app is None:
+        logger.warning("Using fallback response system")
+        yield get_fallback_response(user_input)
+        return
+    
+    from langchain_core.messages import AIMessageChunk
+    
+    produced = False
+    stream = None
+    try:
+        state = build_history(session_id, user_email, user_input, exclude)
+        cacheable = use_cache and is_context_free(state)
+        if cacheable:
+            cached = response_cache.get(user_input)
+            if cached is not None:
+                logger.debug("Response cache hit")
+                yield cached
+                return
+        
+        chunks = []
+        # The model guard's deadline only covers non-streaming calls, so the stream is
+        # held to the same budget here, waiting for each chunk at most until the deadline
+        stream = iterate_with_deadline(
+            langgraph_app.stream(
+                state,
+                config={"configurable": {"thread_id": session_id}},
+                stream_mode="messages"
+            ),
+            LLM_TIMEOUT_SECONDS
+        )
+        for chunk, metadata in stream:
+            if isinstance(chunk, AIMessageChunk) and chunk.content:
+                produced = True
+                chunks.append(format_bot_text(chunk.content))
+                yield chunks[-1]
+        if cacheable and chunks:
+            response_cache.put(user_input, "".join(chunks))
+    except TimeoutError:
+        logger.warning("Streamed reply exceeded the %ss deadline", LLM_TIMEOUT_SECONDS)
+        yield ("\n\n" if produced else "") + get_fallback_response(user_input)
+    except Exception as e:
+        logger.error(f"Error streaming bot response: {e}")
+        if not produced:
+            yield get_fallback_response(user_input)
+    finally:
+        if stream is not None:
+            stream.close()
+
 # ----- Directions API endpoint -----
+MAX_DIRECTION_PAIRS = int(os.getenv("MAX_DIRECTION_PAIRS", "1000000"))
+
+def directions_batch(data):
+    """One-to-many ({"origin", "destinations"}) or M×N ({"origins", "destinations"}) distances.
+
+    Each origin's destinations are returned nearest first, truncated to k if given.
+    """
+    origins = to_lon_lat_array(data['origins'] if 'origins' in data else [data['origin']])
+    destinations = to_lon_lat_array(data['destinations'])
+    if len(origins) * len(destinations) > MAX_DIRECTION_PAIRS:
+        return jsonify({"error": f"At most {MAX_DIRECTION_PAIRS} origin/destination pairs are allowed"}), 400
+    
+    k = data.get('k')
+    if k is not None and (not isinstance(k, int) or k < 1):
+        return jsonify({"error": "k must be a positive integer"}), 400
+    
+    distances = haversine_matrix(origins, destinations)
+    durations = estimate_duration(distances)
+    order = nearest_indices(distances, k)
+    
+    results = [
+        [
+            {"index": int(j), "distance": float(distances[i, j]), "duration": float(durations[i, j])}
+            for j in order[i]
+        ]
+        for i in range(len(origins))
+    ]
+    if 'origins' in data:
+        return jsonify({"results": results})
+    return jsonify({"results": results[0]})
+
 @app.route('/api/directions', methods=['POST', 'OPTIONS'])
 def get_directions():
     if request.method == 'OPTIONS':
@@ -221,33 +840,19 @@ def get_directions():
         
     try:
         data = request.get_json()
+        if 'destinations' in data:
+            return directions_batch(data)
+        
         coordinates = data.get('coordinates', [])
         
         if len(coordinates) < 2:
             return jsonify({"error": "At least two coordinates are required"}), 400
         
-        # Extract start and end coordinates
-        start_lon, start_lat = coordinates[0]
-        end_lon, end_lat = coordinates[1]
-        
-        # Calculate distance using Haversine formula (more accurate)
-        R = 6371000  # Earth radius in meters
-        lat1 = radians(start_lat)
-        lon1 = radians(start_lon)
-        lat2 = radians(end_lat)
-        lon2 = radians(end_lon)
-        
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        
-        distance_meters = R * c
-        
-        # Estimate time based on average driving speed (50 km/h ≈ 13.89 m/s)
-        # Add some extra time for traffic and stops
-        duration_seconds = (distance_meters / 13.89) * 1.3
+        # Distance between the first two coordinates using the Haversine formula
+        distance_meters = float(haversine_matrix(
+            to_lon_lat_array(coordinates[:1]), to_lon_lat_array(coordinates[1:2])
+        )[0, 0])
+        duration_seconds = estimate_duration(distance_meters)
         
         return jsonify({
             "routes": [{
@@ -257,10 +862,43 @@ def get_directions():
                 }
             }]
         })
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid coordinates: {e}"}), 400
     except Exception as e:
         logger.error(f"Directions error: {e}")
         return jsonify({"error": str(e)}), 500
 
+# ----- Nearby hospitals from the local dataset -----
+HOSPITALS_DATA = os.getenv("HOSPITALS_DATA", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "hospitals.csv"))
+MAX_NEARBY_HOSPITALS = 100
+hospital_index = None
+
+def load_hospitals():
+    global hospital_index
+    if not os.path.exists(HOSPITALS_DATA):
+        logger.warning(f"Hospital dataset not found at {HOSPITALS_DATA}, /api/hospitals/nearby is disabled")
+        return
+    try:
+        hospital_index = HospitalIndex.load(HOSPITALS_DATA)
+        logger.info("Loaded %d hospitals from %s", len(hospital_index), HOSPITALS_DATA)
+    except Exception as e:
+        logger.error(f"Failed to load hospital dataset: {e}")
+
+@app.route('/api/hospitals/nearby', methods=['GET'])
+def nearby_hospitals():
+    if hospital_index is None:
+        return jsonify({"error": "Hospital dataset not loaded"}), 503
+    
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    if lat is None or lon is None or abs(lat) > 90 or abs(lon) > 180:
+        return jsonify({"error": "Valid lat and lon query parameters are required"}), 400
+    
+    k = min(max(request.args.get('k', 10, type=int), 1), MAX_NEARBY_HOSPITALS)
+    radius_km = request.args.get('radius_km', type=float)
+    hospitals = hospital_index.nearest(lon, lat, k=k, radius_meters=radius_km * 1000 if radius_km else None)
+    return jsonify({"hospitals": hospitals})
+
 # ----- OPTIONS handlers for preflight requests -----
 @app.route("/api/sessions", methods=['OPTIONS'])
 def options_sessions():
@@ -290,6 +928,18 @@ def options_check_auth():
 def options_directions():
     return '', 200
 
+@app.route("/api/hospitals/nearby", methods=['OPTIONS'])
+def options_nearby_hospitals():
+    return '', 200
+
+@app.route("/api/export", methods=['OPTIONS'])
+def options_export():
+    return '', 200
+
+@app.route("/api/import", methods=['OPTIONS'])
+def options_import():
+    return '', 200
+
 # ----- Flask routes -----
 @app.route('/')
 def serve():
@@ -305,8 +955,32 @@ def get_all_sessions():
     if not user_email:
         return jsonify({"authenticated": False, "error": "Not authenticated. Please log in."}), 200
     
-    sessions = get_sessions()
-    return jsonify(sessions)
+    # An unchanged session list is answered with 304 before any session is read
+    version = get_sessions_version(user_email)
+    if version is not None and request.if_none_match.contains_weak(version):
+        response = Response(status=304)
+    else:
+        cursor = request.args.get('cursor')
+        limit = request.args.get('limit', type=int)
+        if cursor is None and limit is None:
+            sessions, _ = get_sessions()
+            response = jsonify(sessions)
+        else:
+            limit = min(max(limit or SESSION_PAGE_LIMIT, 1), SESSION_PAGE_LIMIT)
+            try:
+                sessions, next_cursor = get_sessions(cursor=cursor, limit=limit)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            response = jsonify({
+                "sessions": sessions,
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None
+            })
+    
+    if version is not None:
+        response.set_etag(version, weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route("/api/sessions", methods=['POST'])
 def create_session():
@@ -318,12 +992,18 @@ def create_session():
     session_id = data.get('session_id', datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S%f"))
     
     if chat_collection is not None:
-        chat_collection.insert_one({
-            "session_id": session_id,
-            "user_email": user_email,
-            "messages": [],
-            "last_updated": datetime.now(timezone.utc)
-        })
+        try:
+            chat_collection.insert_one({
+                "session_id": session_id,
+                "user_email": user_email,
+                "message_count": 0,
+                "last_updated": datetime.now(timezone.utc)
+            })
+        except DuplicateKeyError:
+            # The unique session_id index rejected it: a retried create is fine, anyone else's session is not
+            if chat_collection.find_one({"session_id": session_id, "user_email": user_email}, {"_id": 1}) is None:
+                return jsonify({"error": "Session already exists"}), 409
+            return jsonify({"session_id": session_id, "status": "exists"})
     
     return jsonify({"session_id": session_id, "status": "created"})
 
@@ -333,8 +1013,21 @@ def get_session_messages(session_id):
     if not user_email:
         return jsonify({"authenticated": False, "error": "Not authenticated. Please log in."}), 200
     
-    messages = get_messages_for_session(session_id)
-    return jsonify(messages)
+    before = request.args.get('before', type=int)
+    limit = request.args.get('limit', type=int)
+    if before is None and limit is None:
+        with phase("history"):
+            messages, _ = get_messages_for_session(session_id, user_email)
+        return jsonify(messages)
+    
+    limit = min(max(limit or MESSAGE_PAGE_LIMIT, 1), MESSAGE_PAGE_LIMIT)
+    with phase("history"):
+        messages, next_before = get_messages_for_session(session_id, user_email, before=before, limit=limit)
+    return jsonify({
+        "messages": messages,
+        "next_before": next_before,
+        "has_more": next_before is not None
+    })
 
 @app.route("/api/sessions/<session_id>/messages", methods=['POST'])
 def send_message(session_id):
@@ -348,22 +1041,169 @@ def send_message(session_id):
     if not user_input:
         return jsonify({'error': 'No message provided'}), 400
     
-    logger.info(f"Received message from {user_email}: {user_input}")
+    logger.info("Received message: %s", redact(user_input), extra={"session_id": session_id, "user": user_email})
+    received_at = datetime.now(timezone.utc)
     
-    save_message(session_id, user_input, 'user')
-    bot_response = generate_bot_response(session_id, user_input)
-    save_message(session_id, bot_response, 'bot')
-    
-    logger.info(f"Sent bot response: {bot_response[:100]}...")
+    alert = triage_message(user_input)
+    stream_format = get_stream_format()
+    if stream_format:
+        return stream_message_response(session_id, user_email, user_input, stream_format, received_at, alert)
+    if alert is not None:
+        return triage_response(session_id, user_email, user_input, alert, received_at)
     
     return jsonify({
         'user_message': user_input,
-        'bot_response': bot_response
+        'bot_response': reply_to_message(session_id, user_email, user_input, received_at)
     })
 
+def triage_response(session_id, user_email, user_input, alert, received_at):
+    exclude = save_triage_turn(session_id, user_email, user_input, alert, received_at)
+    if follow_up_executor is not None:
+        follow_up_executor.submit(follow_up_after_triage, session_id, user_email, user_input, exclude)
+    return jsonify(triage_payload(user_input, alert, follow_up_executor is not None and langgraph_app is not None))
+
+# ----- Answering a chat message -----
+# Shared by the Flask route above and the ASGI serving mode (asgi.py), so they take
+# the user explicitly instead of reading it from the Flask session.
+def reply_to_message(session_id, user_email, user_input, received_at):
+    """Answer a message with the model (or the fallback) and save the turn; returns the reply."""
+    bot_response = generate_bot_response(session_id, user_email, user_input)
+    save_turn(session_id, user_email, user_input, bot_response, received_at)
+    logger.info("Sent bot response: %s", redact(bot_response), extra={"session_id": session_id})
+    return bot_response
+
+def save_triage_turn(session_id, user_email, user_input, alert, received_at):
+    """Save a triaged message with its emergency reply.
+
+    Returns the ids of the saved messages, which a follow-up leaves out of the
+    history it sends to the model.
+    """
+    saved = save_turn(session_id, user_email, user_input, alert.response, received_at)
+    logger.info("Emergency triage (%s) answered without the model", alert.category, extra={"session_id": session_id})
+    return {msg["_id"] for msg in saved}
+
+def triage_payload(user_input, alert, follow_up):
+    return {
+        'user_message': user_input,
+        'bot_response': alert.response,
+        'triage': {'category': alert.category, 'source': alert.source},
+        'follow_up': follow_up
+    }
+
+def message_events(session_id, user_email, user_input, received_at, alert=None, follow_up=True):
+    """Yield a streamed reply as events: token events followed by a done event.
+
+    A triaged message (alert set) is saved with the emergency reply and sent as a
+    triage event before anything else. With TRIAGE_FOLLOW_UP (and follow_up) the
+    model's answer then streams as usual and is saved as a further bot message;
+    otherwise the done event carries the emergency reply. The turn is saved when
+    the generator finishes or is closed, so a client disconnecting mid-stream
+    still keeps its message and whatever was generated.
+    """
+    exclude = ()
+    if alert is not None:
+        exclude = save_triage_turn(session_id, user_email, user_input, alert, received_at)
+        yield {"type": "triage", "category": alert.category, "content": alert.response}
+        if not (follow_up and TRIAGE_FOLLOW_UP and langgraph_app is not None):
+            yield {"type": "done", "user_message": user_input, "bot_response": alert.response}
+            return
+    
+    chunks = []
+    try:
+        for chunk in stream_bot_response(session_id, user_email, user_input, exclude, use_cache=alert is None):
+            chunks.append(chunk)
+            yield {"type": "token", "content": chunk}
+        yield {"type": "done", "user_message": user_input, "bot_response": "".join(chunks)}
+    finally:
+        bot_response = "".join(chunks)
+        if alert is None:
+            save_turn(session_id, user_email, user_input, bot_response, received_at)
+        elif bot_response:
+            save_messages(session_id, [new_message('bot', bot_response, datetime.now(timezone.utc))], user_email)
+        logger.info("Streamed bot response: %s", redact(bot_response), extra={"session_id": session_id})
+
+# ----- Streaming chat responses -----
+STREAM_MIMETYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson"
+}
+
+def get_stream_format():
+    """Pick a streaming format from ?stream=sse|ndjson or the Accept header."""
+    requested = request.args.get('stream', '').lower()
+    if requested in STREAM_MIMETYPES:
+        return requested
+    
+    accept = request.headers.get('Accept', '')
+    for stream_format, mimetype in STREAM_MIMETYPES.items():
+        if mimetype in accept:
+            return stream_format
+    return None
+
+def encode_stream_event(stream_format, event):
+    payload = json.dumps(event)
+    if stream_format == "sse":
+        return f"event: {event['type']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+def stream_message_response(session_id, user_email, user_input, stream_format, received_at, alert=None):
+    """Stream the reply from message_events in the requested format."""
+    events = message_events(session_id, user_email, user_input, received_at, alert)
+    
+    def generate():
+        try:
+            for event in events:
+                yield encode_stream_event(stream_format, event)
+        finally:
+            # Also runs when the client disconnects, so the turn is still saved
+            events.close()
+    
+    response = Response(stream_with_context(generate()), mimetype=STREAM_MIMETYPES[stream_format])
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# ----- Authentication helpers -----
+# Every login/signup attempt counts against the client IP; only failed logins count against the account
+ip_throttle = Throttle(int(os.getenv("AUTH_IP_LIMIT", "30")), int(os.getenv("AUTH_IP_WINDOW_SECONDS", "60")))
+account_throttle = Throttle(int(os.getenv("AUTH_ACCOUNT_LIMIT", "10")), int(os.getenv("AUTH_ACCOUNT_WINDOW_SECONDS", "300")))
+user_cache = UserCache(ttl_seconds=int(os.getenv("USER_CACHE_TTL_SECONDS", "300")))
+
+def throttled_response(retry_after):
+    response = jsonify({"verified": False, "error": "Too many attempts. Please try again later."})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+def hasher_busy_response():
+    response = jsonify({"verified": False, "error": "Server is busy. Please try again shortly."})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def check_ip_throttle():
+    """Record an auth attempt for the client IP; returns a 429 response if it is over the limit."""
+    key = f"ip:{request.remote_addr}"
+    retry_after = ip_throttle.retry_after(key)
+    if retry_after:
+        return throttled_response(retry_after)
+    ip_throttle.record(key)
+    return None
+
+def get_user(email):
+    """Look up a user record, served from the TTL cache when possible."""
+    user = user_cache.get(email)
+    if user is not None or users_collection is None:
+        return user
+    
+    user = users_collection.find_one({"email": email}, {"password": 0})
+    if user:
+        user_cache.put(email, user)
+    return user
+
 @app.route("/api/logout", methods=["POST"])
 def logout():
-    session.pop('user_email', None)
+    user_email = session.pop('user_email', None)
+    if user_email:
+        user_cache.invalidate(user_email)
     return jsonify({"message": "Logged out successfully", "redirect": "/login"}), 200
 
 @app.route("/api/signup", methods=['POST'])
@@ -383,23 +1223,34 @@ def signup():
     if len(password) < 8:
         return jsonify({"error": "Password must be at least 8 characters long"}), 400
     
+    throttled = check_ip_throttle()
+    if throttled:
+        return throttled
+    
     try:
         if users_collection is not None:
-            existing_user = users_collection.find_one({"email": email})
+            existing_user = users_collection.find_one({"email": email}, {"_id": 1})
             if existing_user:
                 return jsonify({"error": "Email already registered"}), 409
         
-        hashed_password = generate_password_hash(password)
+        hashed_password = password_hasher.hash(password)
         if users_collection is not None:
-            users_collection.insert_one({
-                "email": email,
-                "password": hashed_password,
-                "created_at": datetime.now(timezone.utc)
-            })
+            try:
+                users_collection.insert_one({
+                    "email": email,
+                    "password": hashed_password,
+                    "created_at": datetime.now(timezone.utc)
+                })
+            except DuplicateKeyError:
+                # Lost a race with a concurrent signup; the unique email index rejects it
+                return jsonify({"error": "Email already registered"}), 409
         
+        user_cache.invalidate(email)
         session['user_email'] = email
         return jsonify({"message": "User registered successfully"}), 201
     
+    except PasswordHasherBusy:
+        return hasher_busy_response()
     except Exception as e:
         logger.error(f"Signup error: {e}")
         return jsonify({"error": str(e)}), 500
@@ -414,6 +1265,13 @@ def login():
     email = data['email']
     password = data['password']
     
+    throttled = check_ip_throttle()
+    if throttled:
+        return throttled
+    retry_after = account_throttle.retry_after(f"email:{email}")
+    if retry_after:
+        return throttled_response(retry_after)
+    
     try:
         user = None
         if users_collection is not None:
@@ -422,9 +1280,12 @@ def login():
         if not user:
             return jsonify({"verified": False, "error": "User not found"}), 200
         
-        if not check_password_hash(user['password'], password):
+        if not password_hasher.verify(user['password'], password):
+            account_throttle.record(f"email:{email}")
             return jsonify({"verified": False, "error": "Invalid password"}), 200
         
+        account_throttle.reset(f"email:{email}")
+        user_cache.put(email, user)
         session['user_email'] = email
         return jsonify({
             "verified": True,
@@ -435,6 +1296,8 @@ def login():
             }
         }), 200
     
+    except PasswordHasherBusy:
+        return hasher_busy_response()
     except Exception as e:
         logger.error(f"Login error: {e}")
         return jsonify({"verified": False, "error": str(e)}), 500
@@ -446,9 +1309,7 @@ def check_auth():
     if not user_email:
         return jsonify({"authenticated": False, "error": "User not authenticated"}), 200
 
-    user = None
-    if users_collection is not None:
-        user = users_collection.find_one({"email": user_email})
+    user = get_user(user_email)
     
     if user:
         return jsonify({"authenticated": True, "email": user_email}), 200
@@ -464,8 +1325,16 @@ def delete_session(session_id):
             return jsonify({"authenticated": False, "error": "Not authenticated"}), 200
         
         if chat_collection is not None:
-            result = chat_collection.delete_one({"session_id": session_id, "user_email": user_email})
-            if result.deleted_count > 0:
+            chat = chat_collection.find_one_and_delete(
+                {"session_id": session_id, "user_email": user_email},
+                projection={"message_count": 1}
+            )
+            if write_queue is not None:
+                write_queue.discard(session_id)
+            if chat is not None:
+                message_collection.delete_many({"_id": {"$in": bucket_ids(session_id, 0, chat.get("message_count", 0))}})
+                if memory is not None:
+                    memory.delete_thread(session_id)
                 return jsonify({"message": "Session deleted successfully"}), 200
             else:
                 return jsonify({"error": "Session not found"}), 404
@@ -475,6 +1344,292 @@ def delete_session(session_id):
         logger.error(f"Delete session error: {e}")
         return jsonify({"error": str(e)}), 500
 
+# ----- Export and import of chat history -----
+# One JSON object per line: an "export" header, then each session followed by its
+# messages in sequence order. Both directions stream, so memory use stays flat no
+# matter how much history a user has.
+EXPORT_FORMAT_VERSION = 1
+EXPORT_READ_MESSAGES = 20 * MESSAGE_BUCKET_SIZE
+EXPORT_CHUNK_BYTES = 64 * 1024
+IMPORT_BATCH_MESSAGES = int(os.getenv("IMPORT_BATCH_MESSAGES", "5000"))
+
+def export_line(record):
+    return json.dumps(record, default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value)) + "\n"
+
+def export_history(user_email):
+    """Yield a user's sessions and messages as NDJSON lines."""
+    yield export_line({
+        "type": "export",
+        "version": EXPORT_FORMAT_VERSION,
+        "user_email": user_email,
+        "exported_at": datetime.now(timezone.utc)
+    })
+    chats = chat_collection.find(
+        {"user_email": user_email},
+        {"_id": 0, "messages": 0, "user_email": 0},
+        batch_size=100
+    ).sort([("last_updated", -1), ("session_id", -1)])
+    
+    for chat in chats:
+        session_id = chat["session_id"]
+        stored = chat.get("message_count", 0)
+        pending = pending_messages(session_id)
+        total = stored + len(split_pending(pending, stored)[1])
+        yield export_line({"type": "session", **chat, "message_count": total})
+        
+        # A bounded window of buckets at a time, never the whole session
+        for start in range(0, total, EXPORT_READ_MESSAGES):
+            end = min(start + EXPORT_READ_MESSAGES, total)
+            for msg in merge_pending(pending, load_messages(session_id, start, min(end, stored)), stored, start, end):
+                yield export_line({"type": "message", "session_id": session_id, **msg})
+
+def chunk_lines(lines, size=EXPORT_CHUNK_BYTES):
+    """Group lines into chunks of about size bytes, so the response is not one write per line."""
+    chunk, length = [], 0
+    for line in lines:
+        data = line.encode("utf-8")
+        chunk.append(data)
+        length += len(data)
+        if length >= size:
+            yield b"".join(chunk)
+            chunk, length = [], 0
+    if chunk:
+        yield b"".join(chunk)
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def parse_datetime(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+class HistoryImporter:
+    """Writes exported history back, batching bucket writes with bulk_write.
+
+    A session's messages are first written as whole buckets to the ImportStaging
+    collection, in bulk writes of batch_messages messages; progress(stats) is
+    called after each of them. Only once a session is fully staged is it switched
+    over: the staged buckets are copied to their real ids, the header is replaced,
+    and old buckets the import did not rewrite are deleted. A failure before the
+    switch leaves the stored session as it was.
+
+    Importing the same file twice leaves the same data. Sessions whose id already
+    belongs to another user are skipped. Messages must arrive in sequence order,
+    as export_history writes them: a message whose seq is not an integer above
+    the previous one is skipped as an invalid line. Messages are renumbered from 0
+    in file order, and message_count is taken from them rather than from the file,
+    so an upload cannot claim more messages than it stored.
+    """
+    
+    def __init__(self, user_email=None, batch_messages=IMPORT_BATCH_MESSAGES, progress=None):
+        self.user_email = user_email
+        self.batch_messages = batch_messages
+        self.progress = progress
+        self.stats = {"sessions": 0, "messages": 0, "skipped_sessions": 0, "invalid_lines": 0, "batches": 0}
+        self.import_id = str(ObjectId())
+        self.staging = db['ImportStaging']
+        self.session_id = None
+        self.header = None
+        self.staged_buckets = set()
+        self.bucket = None
+        self.bucket_messages = []
+        self.operations = []
+        self.batched = 0
+        self.last_seq = -1
+        self.next_seq = 0
+    
+    def run(self, lines):
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                self.add(json.loads(line))
+            except (ValueError, KeyError, TypeError) as e:
+                self.stats["invalid_lines"] += 1
+                logger.warning("Skipping invalid import line: %s", e)
+        self.finish_session()
+        return self.stats
+    
+    def add(self, record):
+        kind = record.get("type")
+        if kind == "export":
+            self.user_email = self.user_email or record.get("user_email")
+        elif kind == "session":
+            self.start_session(record)
+        elif kind == "message":
+            self.add_message(record)
+    
+    def start_session(self, record):
+        self.finish_session()
+        session_id = str(record["session_id"])
+        if not self.user_email:
+            raise ValueError("no user_email for imported sessions")
+        
+        existing = chat_collection.find_one({"session_id": session_id}, {"_id": 0, "user_email": 1})
+        if existing is not None and existing.get("user_email") != self.user_email:
+            self.stats["skipped_sessions"] += 1
+            logger.warning("Skipping imported session %s: it belongs to another user", session_id)
+            return
+        
+        self.session_id = session_id
+        self.header = {
+            "session_id": session_id,
+            "user_email": self.user_email,
+            "last_updated": parse_datetime(record.get("last_updated")) or datetime.now(timezone.utc)
+        }
+        for field in ("title", "last_snippet", "summary"):
+            if record.get(field) is not None:
+                self.header[field] = record[field]
+    
+    def add_message(self, record):
+        if self.session_id is None or record["session_id"] != self.session_id:
+            return
+        seq = record["seq"]
+        if not isinstance(seq, int) or isinstance(seq, bool) or seq <= self.last_seq:
+            raise ValueError(f"message seq {seq!r} is not an integer above {self.last_seq}")
+        msg = {
+            "_id": str(record.get("_id") or ObjectId()),
+            "sender": record["sender"],
+            "content": record["content"],
+            "timestamp": parse_datetime(record.get("timestamp")),
+            "seq": self.next_seq
+        }
+        self.last_seq = seq
+        self.next_seq += 1
+        bucket = msg["seq"] // MESSAGE_BUCKET_SIZE
+        if bucket != self.bucket:
+            self.finish_bucket()
+            self.bucket = bucket
+        self.bucket_messages.append(msg)
+        self.stats["messages"] += 1
+    
+    def finish_bucket(self):
+        if self.bucket_messages:
+            target = bucket_id(self.session_id, self.bucket)
+            self.operations.append(ReplaceOne(
+                {"_id": f"{self.import_id}:{target}"},
+                {
+                    "import_id": self.import_id,
+                    "target": target,
+                    "session_id": self.session_id,
+                    "bucket": self.bucket,
+                    "messages": self.bucket_messages,
+                    "staged_at": datetime.now(timezone.utc)
+                },
+                upsert=True
+            ))
+            self.staged_buckets.add(target)
+            self.batched += len(self.bucket_messages)
+        self.bucket = None
+        self.bucket_messages = []
+        if self.batched >= self.batch_messages:
+            self.flush()
+    
+    def flush(self):
+        if not self.operations:
+            return
+        self.staging.bulk_write(self.operations, ordered=False)
+        self.operations = []
+        self.batched = 0
+        self.stats["batches"] += 1
+        if self.progress is not None:
+            self.progress(dict(self.stats))
+    
+    def finish_session(self):
+        if self.session_id is None:
+            return
+        self.finish_bucket()
+        self.flush()
+        self.header["message_count"] = self.next_seq
+        self.switch_session()
+        self.stats["sessions"] += 1
+        self.session_id = None
+        self.header = None
+        self.staged_buckets = set()
+        self.last_seq = -1
+        self.next_seq = 0
+    
+    def switch_session(self):
+        session_id = self.session_id
+        previous = chat_collection.find_one({"session_id": session_id}, {"_id": 0, "message_count": 1})
+        
+        staged = {"import_id": self.import_id, "session_id": session_id}
+        operations = []
+        for doc in self.staging.find(staged, batch_size=100):
+            operations.append(ReplaceOne(
+                {"_id": doc["target"]},
+                {"session_id": session_id, "bucket": doc["bucket"], "messages": doc["messages"]},
+                upsert=True
+            ))
+            if len(operations) >= 100:
+                message_collection.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            message_collection.bulk_write(operations, ordered=False)
+        
+        chat_collection.replace_one({"session_id": session_id}, self.header, upsert=True)
+        if previous is not None:
+            stale = [bid for bid in bucket_ids(session_id, 0, previous.get("message_count", 0)) if bid not in self.staged_buckets]
+            if stale:
+                message_collection.delete_many({"_id": {"$in": stale}})
+        self.staging.delete_many(staged)
+        if memory is not None:
+            memory.delete_thread(session_id)
+
+@app.route('/api/export', methods=['GET'])
+def export_sessions():
+    """Stream all of the user's sessions and messages as NDJSON; ?gzip=true compresses it"""
+    user_email = session.get('user_email')
+    if not user_email:
+        return jsonify({"authenticated": False, "error": "Not authenticated. Please log in."}), 200
+    if chat_collection is None:
+        return jsonify({"error": "Storage is not available"}), 503
+    
+    chunks = chunk_lines(export_history(user_email))
+    filename = f"healthassist-export-{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}.ndjson"
+    if request.args.get('gzip', 'false').lower() == 'true':
+        response = Response(stream_with_context(gzip_chunks(chunks)), mimetype="application/gzip")
+        filename += ".gz"
+    else:
+        response = Response(stream_with_context(chunks), mimetype="application/x-ndjson")
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def request_lines():
+    """Lines of the request body, gunzipped on the fly if it is gzip-compressed."""
+    stream = request.stream
+    if request.headers.get('Content-Encoding') == 'gzip' or request.mimetype == 'application/gzip':
+        stream = gzip.GzipFile(fileobj=stream)
+    return io.TextIOWrapper(stream, encoding="utf-8")
+
+@app.route('/api/import', methods=['POST'])
+def import_sessions():
+    """Import an export file (NDJSON, optionally gzipped) into the user's account"""
+    user_email = session.get('user_email')
+    if not user_email:
+        return jsonify({"authenticated": False, "error": "Not authenticated. Please log in."}), 200
+    if chat_collection is None:
+        return jsonify({"error": "Storage is not available"}), 503
+    
+    def progress(stats):
+        logger.info("Import progress: %d sessions, %d messages", stats["sessions"], stats["messages"],
+                    extra={"user": user_email, "batches": stats["batches"]})
+    
+    try:
+        stats = HistoryImporter(user_email=user_email, progress=progress).run(request_lines())
+    except (OSError, UnicodeDecodeError) as e:
+        return jsonify({"error": f"Could not read the import file: {e}"}), 400
+    except Exception as e:
+        logger.error(f"Import error: {e}")
+        return jsonify({"error": str(e)}), 500
+    return jsonify(stats)
+
 @app.route('/emergency-map')
 def emergency_map():
     return '''
@@ -486,6 +1641,9 @@ def emergency_map():
             body { font-family: Arial, sans-serif; padding: 20px; text-align: center; }
             iframe { width: 90%; height: 500px; border: none; border-radius: 10px; margin-top: 20px; box-shadow: 0 4px 10px rgba(0,0,0,0.1); }
             .loading { font-size: 18px; color: #444; }
+            .hospitals { list-style: none; padding: 0; max-width: 600px; margin: 20px auto; text-align: left; }
+            .hospitals li { padding: 12px 16px; margin-bottom: 10px; border-radius: 10px; box-shadow: 0 2px 6px rgba(0,0,0,0.1); }
+            .hospitals a { color: #007bff; text-decoration: none; }
         </style>
     </head>
     <body>
@@ -493,6 +1651,32 @@ def emergency_map():
         <p class="loading">Trying to detect your current location. Please allow location access.</p>
         <div id="map-container"></div>
         <script>
+            function showHospitals(hospitals) {
+                const list = document.createElement('ul');
+                list.className = 'hospitals';
+                hospitals.forEach((h) => {
+                    const item = document.createElement('li');
+                    const km = (h.distance / 1000).toFixed(1);
+                    const mins = Math.round(h.duration / 60);
+                    const name = document.createElement('strong');
+                    name.textContent = h.name;
+                    const link = document.createElement('a');
+                    link.href = `https://www.google.com/maps/dir/?api=1&destination=${h.lat},${h.lon}`;
+                    link.target = '_blank';
+                    link.textContent = 'Get directions';
+                    item.append(name, ` — ${km} km, about ${mins} min `, link);
+                    list.appendChild(item);
+                });
+                document.querySelector('.loading').style.display = 'none';
+                document.getElementById('map-container').appendChild(list);
+            }
+            function findHospitals(lat, lon) {
+                // Prefer the backend's local hospital index; fall back to the map search
+                fetch(`/api/hospitals/nearby?lat=${lat}&lon=${lon}&k=10`)
+                    .then((r) => r.ok ? r.json() : Promise.reject(r.status))
+                    .then((data) => data.hospitals.length ? showHospitals(data.hospitals) : showMap(lat, lon))
+                    .catch(() => showMap(lat, lon));
+            }
             function showMap(lat, lon) {
                 const iframe = document.createElement('iframe');
                 iframe.src = `https://www.google.com/maps?q=hospitals+near+${lat},${lon}&output=embed`;
@@ -507,7 +1691,7 @@ def emergency_map():
                     (position) => {
                         const lat = position.coords.latitude;
                         const lon = position.coords.longitude;
-                        showMap(lat, lon);
+                        findHospitals(lat, lon);
                     },
                     () => showError('Location access denied. Please allow it or search manually.')
                 );
@@ -527,13 +1711,134 @@ def health_check():
     
     return jsonify({
         "status": "ok",
+        "ready": is_ready(),
+        "startup": startup_status(),
         "groq_api": groq_status,
         "mongodb": mongo_status,
+        "response_cache": response_cache.stats(),
+        "model": model_guard.stats() if model_guard is not None else None,
         "timestamp": datetime.now(timezone.utc).isoformat()
     })
 
+@app.route('/api/health/live', methods=['GET'])
+def liveness_check():
+    """The process is up and serving requests"""
+    return jsonify({"status": "ok"})
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    """MongoDB is connected and startup has finished; 503 until then"""
+    return jsonify({"ready": is_ready(), "startup": startup_status()}), 200 if is_ready() else 503
+
+# ----- Prometheus metrics -----
+# Values are per process; with several workers, scrape each one or aggregate by instance.
+metrics.registry.register(Gauge(
+    "healthassist_write_behind_backlog", "Chat messages queued for write-behind.",
+    lambda: write_queue.backlog if write_queue is not None else 0
+))
+metrics.registry.register(Gauge(
+    "healthassist_model_circuit_open", "1 while the model circuit breaker is open or half-open.",
+    lambda: int(model_guard is not None and model_guard.breaker.state != "closed")
+))
+metrics.registry.register(Gauge(
+    "healthassist_checkpoint_cache_bytes", "Serialized graph checkpoints held in memory.",
+    lambda: memory.total_bytes if memory is not None else 0
+))
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+# ----- Startup -----
+# With STARTUP_MODE=background the module returns immediately, so the server starts
+# listening at once, and MongoDB, the chat graph and the hospital dataset are brought
+# up on background threads; /api/health/ready answers 503 until they are. The default
+# (blocking) does that work before serving. Either way an unreachable MongoDB is
+# retried with backoff instead of leaving the process without storage.
+STARTUP_MODE = os.getenv("STARTUP_MODE", "blocking").lower()
+MONGO_RETRY_MAX_SECONDS = float(os.getenv("MONGO_RETRY_MAX_SECONDS", "30"))
+finished_startup_tasks = set()
+
+def connect_mongo():
+    """Connect, prepare the database and publish the collections; raises if unreachable."""
+    global client, db, chat_collection, users_collection, message_collection, checkpoint_collection, response_cache_collection
+    new_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000, event_listeners=[MongoCommandTimer()])
+    try:
+        new_client.server_info()  # Force connection check
+        new_db = new_client['Chatbot']
+        failed_indexes = ensure_indexes(new_db)
+        if failed_indexes:
+            # Without them hot queries scan, and a missing unique index stops guarding against duplicates
+            logger.error("MongoDB indexes not created: %s", ", ".join(failed_indexes))
+        try:
+            migrate_embedded_messages(new_db)
+        except Exception as e:
+            logger.error(f"Message storage migration failed: {e}")
+    except Exception:
+        new_client.close()
+        raise
+    
+    with startup_lock:
+        client, db = new_client, new_db
+        users_collection = db['Users']
+        message_collection = db['Messages']
+        checkpoint_collection = db['Checkpoints']
+        response_cache_collection = db['ResponseCache']
+        if memory is not None:
+            memory.collection = checkpoint_collection
+        if RESPONSE_CACHE_SHARED:
+            response_cache.collection = response_cache_collection
+        # Published last: chat_collection being set is what marks storage as available
+        chat_collection = db['Chats']
+    logger.info("MongoDB connection successful")
+
+def keep_connecting():
+    delay = 1
+    while True:
+        try:
+            connect_mongo()
+            return
+        except Exception as e:
+            logger.error(f"MongoDB connection failed, retrying in {delay:.0f}s: {e}")
+            time.sleep(delay)
+            delay = min(delay * 2, MONGO_RETRY_MAX_SECONDS)
+
+def run_startup_task(name, task):
+    try:
+        task()
+    finally:
+        finished_startup_tasks.add(name)
+
+def start_backend():
+    tasks = {"graph": init_graph, "hospitals": load_hospitals}
+    if STARTUP_MODE == "background":
+        threading.Thread(target=keep_connecting, name="mongo-connect", daemon=True).start()
+        for name, task in tasks.items():
+            threading.Thread(target=run_startup_task, args=(name, task), name=f"startup-{name}", daemon=True).start()
+        return
+    
+    try:
+        connect_mongo()
+    except Exception as e:
+        logger.error(f"MongoDB connection failed: {e}")
+        threading.Thread(target=keep_connecting, name="mongo-connect", daemon=True).start()
+    for name, task in tasks.items():
+        run_startup_task(name, task)
+
+def startup_status():
+    return {
+        "mongodb": chat_collection is not None,
+        "graph": "graph" in finished_startup_tasks,
+        "hospitals": "hospitals" in finished_startup_tasks
+    }
+
+def is_ready():
+    return all(startup_status().values())
+
+start_backend()
+
 if __name__ == '__main__':
     logger.info("Starting Flask server...")
-    logger.info(f"GROQ API Status: {'Available' if langgraph_app is not None else 'Unavailable'}")
-    logger.info(f"MongoDB Status: {'Connected' if chat_collection is not None else 'Disconnected'}")
+    logger.info("GROQ API Status: %s", 'Available' if langgraph_app is not None else 'Unavailable')
+    logger.info("MongoDB Status: %s", 'Connected' if chat_collection is not None else 'Disconnected')
     app.run(host='127.0.0.1', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,338 @@
+"""ASGI serving mode for the backend.
+
+POST /api/sessions/<session_id>/messages is admitted through a bounded gate: at
+most LLM_MAX_CONCURRENCY chats use the model at once, each on its own thread from
+a pool of that size, and up to LLM_MAX_QUEUE more wait for a slot as coroutines,
+without holding a thread. Beyond that, requests get 503 with Retry-After before
+any work is done. An admitted chat runs the same pipeline as the Flask route
+(app.reply_to_message and app.message_events). Every other route is served by
+the Flask app through asgiref, each request on its own thread, at most
+FLASK_THREADS at a time.
+
+    uvicorn asgi:app --host 127.0.0.1 --port 5000 --workers 4
+"""
+import os
+import re
+import json
+import asyncio
+import logging
+import contextvars
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+
+import app as backend
+import metrics
+from log_setup import redact
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "1000"))
+LLM_RETRY_AFTER_SECONDS = int(os.getenv("LLM_RETRY_AFTER_SECONDS", "5"))
+# Flask-served requests handled at once
+FLASK_THREADS = int(os.getenv("FLASK_THREADS", "32"))
+
+MESSAGES_PATH = re.compile(r"^/api/sessions/([^/]+)/messages$")
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"http://localhost:3000"),
+    (b"access-control-allow-credentials", b"true"),
+    (b"access-control-allow-headers", b"Content-Type, Authorization, Accept"),
+    (b"access-control-allow-methods", b"GET, POST, PUT, DELETE, OPTIONS"),
+]
+
+
+def closing_body(wsgi_application):
+    def application(environ, start_response):
+        body = wsgi_application(environ, start_response)
+        try:
+            yield from body
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+    return application
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi that runs each request on its own thread.
+
+    asgiref runs the WSGI app thread-sensitively, which outside a
+    ThreadSensitiveContext means every request on one shared thread, so a slow
+    Flask route (password hashing, an export) would hold up all the others. Each
+    request gets its own context, and with it its own thread; at most
+    max_requests run at once. asgiref also never closes the response body, which
+    is when Flask runs call_on_close callbacks (such as finishing a streamed
+    request's trace), so the body is closed here once it has been sent.
+    """
+
+    def __init__(self, wsgi_application, max_requests):
+        super().__init__(closing_body(wsgi_application))
+        self.slots = asyncio.Semaphore(max_requests)
+
+    async def __call__(self, scope, receive, send):
+        async with self.slots:
+            async with ThreadSensitiveContext():
+                await super().__call__(scope, receive, send)
+
+
+flask_asgi = ThreadedWsgiToAsgi(backend.app, FLASK_THREADS)
+
+
+class Overloaded(Exception):
+    """Raised when the model call queue is full."""
+
+
+class ModelGate:
+    """Caps concurrent model calls and sheds load once too many are waiting."""
+
+    def __init__(self, max_concurrency, max_queue):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_queue = max_queue
+        self.waiting = 0
+
+    async def acquire(self):
+        if self.semaphore.locked() and self.waiting >= self.max_queue:
+            raise Overloaded()
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+    def release(self):
+        self.semaphore.release()
+
+
+model_gate = ModelGate(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE)
+# One thread for every chat the gate admits, so the gate bounds real model concurrency
+chat_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="chat")
+
+
+async def run_sync(context, executor, fn, *args):
+    """Run fn on executor (None: the loop's default) inside the request's context.
+
+    The context carries the request's metrics trace, so phases recorded by the
+    pipeline are counted for this request.
+    """
+    return await asyncio.get_running_loop().run_in_executor(executor, context.run, fn, *args)
+
+
+# Referenced until done, so pending follow-ups are not garbage collected
+follow_ups = set()
+
+
+async def follow_up_after_triage(session_id, user_email, user_input, exclude):
+    """Answer a triaged message with the model as well, once the gate admits it."""
+    try:
+        await model_gate.acquire()
+    except Overloaded:
+        logger.warning("Skipping triage follow-up, the model is overloaded")
+        return
+    try:
+        await run_sync(contextvars.copy_context(), chat_executor, backend.follow_up_after_triage,
+                       session_id, user_email, user_input, exclude)
+    finally:
+        model_gate.release()
+
+
+# ----- HTTP plumbing -----
+def header_value(scope, name):
+    return b", ".join(value for key, value in scope["headers"] if key == name).decode("latin-1")
+
+
+def session_user(scope):
+    """Read user_email from the Flask session cookie."""
+    cookies = SimpleCookie()
+    cookies.load(header_value(scope, b"cookie").replace(", ", "; "))
+    morsel = cookies.get(backend.app.config["SESSION_COOKIE_NAME"])
+    if morsel is None:
+        return None
+
+    serializer = backend.app.session_interface.get_signing_serializer(backend.app)
+    try:
+        data = serializer.loads(morsel.value, max_age=int(backend.app.permanent_session_lifetime.total_seconds()))
+    except Exception:
+        return None
+    return data.get("user_email")
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def send_json(send, status, payload, headers=()):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *CORS_HEADERS, *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_overloaded(send):
+    await send_json(
+        send, 503,
+        {"error": "The assistant is busy. Please try again shortly."},
+        [(b"retry-after", str(LLM_RETRY_AFTER_SECONDS).encode())]
+    )
+
+
+def stream_format(scope):
+    requested = parse_qs(scope.get("query_string", b"").decode()).get("stream", [""])[0].lower()
+    if requested in backend.STREAM_MIMETYPES:
+        return requested
+    accept = header_value(scope, b"accept")
+    for name, mimetype in backend.STREAM_MIMETYPES.items():
+        if mimetype in accept:
+            return name
+    return None
+
+
+async def send_message(scope, receive, send, session_id):
+    user_email = session_user(scope)
+    if not user_email:
+        await send_json(send, 200, {"authenticated": False, "error": "Not authenticated. Please log in."})
+        return
+
+    body = await read_body(receive)
+    if body is None:
+        return
+    try:
+        user_input = (json.loads(body or b"{}") or {}).get('message')
+    except (ValueError, AttributeError):
+        user_input = None
+    if not user_input:
+        await send_json(send, 400, {'error': 'No message provided'})
+        return
+
+    logger.info("Received message: %s", redact(user_input), extra={"session_id": session_id, "user": user_email})
+    received_at = datetime.now(timezone.utc)
+    context = contextvars.copy_context()
+
+    alert = backend.triage_message(user_input)
+    selected_format = stream_format(scope)
+    follow_up = backend.TRIAGE_FOLLOW_UP and backend.langgraph_app is not None
+    if selected_format is None:
+        if alert is not None:
+            # Emergency replies skip the gate, so they are never queued behind model calls
+            exclude = await run_sync(context, None, backend.save_triage_turn, session_id, user_email, user_input, alert, received_at)
+            if follow_up:
+                task = asyncio.create_task(follow_up_after_triage(session_id, user_email, user_input, exclude))
+                follow_ups.add(task)
+                task.add_done_callback(follow_ups.discard)
+            await send_json(send, 200, backend.triage_payload(user_input, alert, follow_up))
+            return
+
+        try:
+            await model_gate.acquire()
+        except Overloaded:
+            await send_overloaded(send)
+            return
+        try:
+            bot_response = await run_sync(context, chat_executor, backend.reply_to_message,
+                                          session_id, user_email, user_input, received_at)
+        finally:
+            model_gate.release()
+        await send_json(send, 200, {'user_message': user_input, 'bot_response': bot_response})
+        return
+
+    # The gate is taken before the response starts, so an overloaded server can still answer 503
+    holds_gate = False
+    if alert is None or follow_up:
+        try:
+            await model_gate.acquire()
+            holds_gate = True
+        except Overloaded:
+            if alert is None:
+                await send_overloaded(send)
+                return
+            logger.warning("Skipping triage follow-up, the model is overloaded")
+    events = backend.message_events(session_id, user_email, user_input, received_at, alert, follow_up=holds_gate)
+    executor = chat_executor if holds_gate else None
+
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        disconnected.set()
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", backend.STREAM_MIMETYPES[selected_format].encode()),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+                *CORS_HEADERS,
+            ],
+        })
+        while not disconnected.is_set():
+            event = await run_sync(context, executor, next, events, None)
+            if event is None:
+                await send({"type": "http.response.body", "body": b""})
+                break
+            body = backend.encode_stream_event(selected_format, event).encode("utf-8")
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+    finally:
+        watcher.cancel()
+        try:
+            # Saves the turn, on completion and on client disconnect alike
+            await run_sync(context, executor, events.close)
+        finally:
+            if holds_gate:
+                model_gate.release()
+
+
+async def traced(handler, scope, receive, send, *args):
+    """Run a natively served route with the same request metrics as the Flask routes."""
+    trace = metrics.start_trace()
+    status = [500]
+
+    async def send_with_status(message):
+        if message["type"] == "http.response.start":
+            status[0] = message["status"]
+        await send(message)
+
+    try:
+        await handler(scope, receive, send_with_status, *args)
+    finally:
+        metrics.finish_trace(trace, scope["method"], "/api/sessions/<session_id>/messages", status[0], backend.SLOW_REQUEST_SECONDS)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+
+    if scope["type"] == "http" and scope["method"] == "POST":
+        match = MESSAGES_PATH.match(scope["path"])
+        if match:
+            await traced(send_message, scope, receive, send, match.group(1))
+            return
+
+    await flask_asgi(scope, receive, send)
@@ -0,0 +1,144 @@
+import time
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashes are already queued."""
+
+
+class PasswordHasher:
+    """Runs the deliberately slow password KDFs off the request thread.
+
+    Hashes run in a bounded pool of worker processes ("thread" also works, since
+    hashlib releases the GIL while it hashes). At most max_pending hashes may be
+    running or queued; a request that cannot get a slot within queue_timeout
+    raises PasswordHasherBusy, so a login burst is shed instead of tying up every
+    request thread.
+    """
+
+    def __init__(self, workers=2, max_pending=16, queue_timeout=2.0, executor="process"):
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self.executor_type = executor
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                if self.executor_type == "process":
+                    # Forked rather than spawned, so the workers do not re-import the app's main module
+                    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+                    self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                else:
+                    self.executor = ThreadPoolExecutor(max_workers=self.workers)
+            return self.executor
+
+    def start(self):
+        """Fork the worker processes now.
+
+        Call this before the application starts any threads: a process forked while
+        another thread holds a lock (logging, pymongo, ...) inherits it locked.
+        """
+        executor = self.get_executor()
+        if self.executor_type == "process":
+            # The pool only forks its workers on the first submit
+            executor.submit(int).result()
+
+    def run(self, fn, *args):
+        if not self.slots.acquire(timeout=self.queue_timeout):
+            raise PasswordHasherBusy()
+        try:
+            return self.get_executor().submit(fn, *args).result()
+        finally:
+            self.slots.release()
+
+    def hash(self, password):
+        return self.run(generate_password_hash, password)
+
+    def verify(self, password_hash, password):
+        return self.run(check_password_hash, password_hash, password)
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+
+
+class Throttle:
+    """Sliding-window attempt counter per key (e.g. "ip:1.2.3.4" or "email:a@b.com")."""
+
+    def __init__(self, limit, window_seconds, max_keys=100000):
+        self.limit = limit
+        self.window = window_seconds
+        self.max_keys = max_keys
+        self.attempts = OrderedDict()
+        self.lock = threading.Lock()
+
+    def retry_after(self, key):
+        """Seconds until key may try again, or 0 if it is under the limit."""
+        now = time.monotonic()
+        with self.lock:
+            attempts = self.attempts.get(key)
+            if not attempts:
+                return 0
+            while attempts and attempts[0] <= now - self.window:
+                attempts.popleft()
+            if len(attempts) < self.limit:
+                return 0
+            return max(int(attempts[0] + self.window - now) + 1, 1)
+
+    def record(self, key):
+        with self.lock:
+            attempts = self.attempts.pop(key, None) or deque()
+            attempts.append(time.monotonic())
+            self.attempts[key] = attempts
+            while len(self.attempts) > self.max_keys:
+                self.attempts.popitem(last=False)
+
+    def reset(self, key):
+        with self.lock:
+            self.attempts.pop(key, None)
+
+
+class UserCache:
+    """TTL cache of verified user records (without password hashes), keyed by email."""
+
+    def __init__(self, ttl_seconds=300, max_entries=10000):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, email):
+        with self.lock:
+            entry = self.entries.get(email)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[email]
+                return None
+            self.entries.move_to_end(email)
+            return entry[1]
+
+    def put(self, email, user):
+        user = {key: value for key, value in user.items() if key not in ("password", "_id")}
+        with self.lock:
+            self.entries[email] = (time.monotonic() + self.ttl, user)
+            self.entries.move_to_end(email)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, email):
+        with self.lock:
+            self.entries.pop(email, None)
@@ -0,0 +1,166 @@
+"""Load test for the Flask backend against local stand-ins.
+
+Each virtual user signs up, logs in, creates a session, chats for a number of
+turns, fetches the history, asks for directions and deletes the session.
+Requests go through Flask's test client in this process, so the numbers cover
+the backend itself and exclude network and WSGI server overhead.
+
+    python bench/load_test.py --users 20 --turns 5 --latency-ms 300
+    python bench/load_test.py --mongo-uri mongodb://localhost:27017/ --json results.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stand_ins import load_backend, peak_rss_mb
+
+QUESTIONS = [
+    "I have a headache since this morning",
+    "What can I do for a sore throat?",
+    "My stomach hurts after eating",
+    "How do I get rid of a cough at night?",
+    "I feel tired all the time",
+    "Is ginger tea good for nausea?",
+]
+
+
+class Recorder:
+    """Collects per-endpoint latencies, errors and the peak RSS seen after each request."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.peak_rss = defaultdict(float)
+
+    def timed(self, endpoint, call, expect=200):
+        start = time.perf_counter()
+        response = call()
+        elapsed = time.perf_counter() - start
+        rss = peak_rss_mb()
+        with self.lock:
+            self.latencies[endpoint].append(elapsed)
+            self.peak_rss[endpoint] = max(self.peak_rss[endpoint], rss)
+            if response.status_code != expect:
+                self.errors[endpoint] += 1
+        return response
+
+    def report(self, wall_seconds):
+        rows = []
+        for endpoint, samples in self.latencies.items():
+            ordered = sorted(samples)
+            rows.append({
+                "endpoint": endpoint,
+                "requests": len(ordered),
+                "errors": self.errors[endpoint],
+                "p50_ms": percentile(ordered, 0.50) * 1000,
+                "p95_ms": percentile(ordered, 0.95) * 1000,
+                "p99_ms": percentile(ordered, 0.99) * 1000,
+                "rps": len(ordered) / wall_seconds,
+                "peak_rss_mb": self.peak_rss[endpoint]
+            })
+        return rows
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def read_body(response):
+    # A streamed reply is produced as the body is read, so read it inside the timed call
+    response.get_data()
+    return response
+
+
+def virtual_user(backend, recorder, user_number, turns, stream):
+    client = backend.app.test_client()
+    email = f"bench-{user_number}-{random.randrange(1 << 30)}@example.com"
+    credentials = {"email": email, "password": "bench-password"}
+
+    recorder.timed("POST /api/signup", lambda: client.post("/api/signup", json=credentials), expect=201)
+    recorder.timed("POST /api/login", lambda: client.post("/api/login", json=credentials))
+    session_id = recorder.timed(
+        "POST /api/sessions", lambda: client.post("/api/sessions", json={})
+    ).get_json()["session_id"]
+
+    path = f"/api/sessions/{session_id}/messages"
+    for turn in range(turns):
+        question = {"message": f"{random.choice(QUESTIONS)} ({user_number}.{turn})"}
+        if stream:
+            recorder.timed("POST messages (stream)", lambda: read_body(client.post(path + "?stream=ndjson", json=question)))
+        else:
+            recorder.timed("POST messages", lambda: client.post(path, json=question))
+
+    recorder.timed("GET messages", lambda: client.get(path))
+    recorder.timed("GET messages (page)", lambda: client.get(path + "?limit=20"))
+    recorder.timed("GET /api/sessions", lambda: client.get("/api/sessions"))
+
+    origin = [77.2 + random.random() / 10, 28.6 + random.random() / 10]
+    destinations = [[77.0 + random.random() / 2, 28.4 + random.random() / 2] for _ in range(50)]
+    recorder.timed("POST /api/directions", lambda: client.post(
+        "/api/directions", json={"coordinates": [origin, destinations[0]]}
+    ))
+    recorder.timed("POST /api/directions (batch)", lambda: client.post(
+        "/api/directions", json={"origin": origin, "destinations": destinations, "k": 5}
+    ))
+
+    recorder.timed("DELETE session", lambda: client.delete(f"/api/sessions/{session_id}"))
+
+
+def print_table(rows):
+    header = f"{'endpoint':32} {'reqs':>6} {'errs':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} {'peak RSS MB':>12}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['endpoint']:32} {row['requests']:6d} {row['errors']:5d} {row['p50_ms']:9.1f} "
+              f"{row['p95_ms']:9.1f} {row['p99_ms']:9.1f} {row['rps']:8.1f} {row['peak_rss_mb']:12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--turns", type=int, default=5, help="chat turns per user")
+    parser.add_argument("--latency-ms", type=float, default=300, help="fake model time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="fake model token rate (0 = instant)")
+    parser.add_argument("--stream", action="store_true", help="use the NDJSON streaming chat endpoint")
+    parser.add_argument("--mongo-uri", help="local mongod to use instead of the in-process stand-in")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    logging.basicConfig(level=logging.WARNING)
+    backend = load_backend(args.latency_ms / 1000, args.tokens_per_second, args.mongo_uri)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    recorder = Recorder()
+    start = time.perf_counter()
+    users = [
+        threading.Thread(target=virtual_user, args=(backend, recorder, n, args.turns, args.stream))
+        for n in range(args.users)
+    ]
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+    wall_seconds = time.perf_counter() - start
+
+    rows = recorder.report(wall_seconds)
+    print(f"{args.users} users x {args.turns} turns in {wall_seconds:.2f}s, peak RSS {peak_rss_mb():.1f} MB\n")
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "wall_seconds": wall_seconds, "endpoints": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Micro-benchmarks for hot backend functions, run against local stand-ins.
+
+    python bench/micro.py
+    python bench/micro.py --history 400 --json micro.json
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stand_ins import load_backend, peak_rss_mb
+
+FALLBACK_INPUTS = [
+    "I have had a bad headache since yesterday",
+    "my throat is sore and I have a runny nose",
+    "I think I sprained my ankle playing football",
+    "feeling anxious and can't sleep",
+    "what should I eat for dinner",
+]
+EMERGENCY_INPUTS = [
+    "chest pain, can't breathe",
+    "my father collapsed and is not waking up",
+]
+
+
+def measure(name, fn, repeat, warmup=3):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    row = {
+        "benchmark": name,
+        "runs": repeat,
+        "mean_us": sum(samples) / len(samples) * 1e6,
+        "p50_us": samples[len(samples) // 2] * 1e6,
+        "p95_us": samples[min(int(len(samples) * 0.95), len(samples) - 1)] * 1e6,
+    }
+    print(f"{name:44} {row['mean_us']:12.1f} {row['p50_us']:12.1f} {row['p95_us']:12.1f}")
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--history", type=int, default=200, help="stored messages in the benchmark session")
+    parser.add_argument("--destinations", type=int, default=1000, help="destinations per batch directions call")
+    parser.add_argument("--mongo-uri", help="local mongod to use instead of the in-process stand-in")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    backend = load_backend(latency=0, tokens_per_second=0, mongo_uri=args.mongo_uri)
+    logging.getLogger().setLevel(logging.WARNING)
+    client = backend.app.test_client()
+
+    session_id = f"bench-{int(time.time() * 1000)}"
+    rows = []
+    print(f"{'benchmark':44} {'mean us':>12} {'p50 us':>12} {'p95 us':>12}")
+
+    user_email = "bench@example.com"
+    now = datetime.now(timezone.utc)
+    for turn in range(args.history // 2):
+        backend.save_turn(session_id, user_email, f"question {turn} about a cough that will not go away", "Try honey and warm water.", now)
+
+    rows.append(measure(
+        f"get_session_context ({args.history} msgs)",
+        lambda: backend.get_session_context(session_id, user_email), args.repeat
+    ))
+    context = backend.get_session_context(session_id, user_email)
+    rows.append(measure(
+        f"make_graph_state ({args.history} msgs)",
+        lambda: backend.make_graph_state(session_id, *context, "and now my chest hurts"), args.repeat
+    ))
+    rows.append(measure(
+        "build_history (context + state)",
+        lambda: backend.build_history(session_id, user_email, "and now my chest hurts"), args.repeat
+    ))
+
+    for i, text in enumerate(FALLBACK_INPUTS):
+        rows.append(measure(f"get_fallback_response [{i}]", lambda: backend.get_fallback_response(text), args.repeat * 10))
+
+    # The triage check runs on every message before the model, so what matters is
+    # its cost on ordinary (non-emergency) messages
+    for i, text in enumerate(FALLBACK_INPUTS):
+        rows.append(measure(f"triage_message [{i}]", lambda: backend.triage_message(text), args.repeat * 10))
+    long_message = " ".join(FALLBACK_INPUTS) * 20
+    rows.append(measure(f"triage_message ({len(long_message)} chars)", lambda: backend.triage_message(long_message), args.repeat * 10))
+    for i, text in enumerate(EMERGENCY_INPUTS):
+        rows.append(measure(f"triage_message (emergency) [{i}]", lambda: backend.triage_message(text), args.repeat * 10))
+
+    pair = {"coordinates": [[77.2090, 28.6139], [77.1025, 28.7041]]}
+    batch = {
+        "origin": [77.2090, 28.6139],
+        "destinations": [[77.0 + (i % 100) / 200, 28.4 + (i // 100) / 50] for i in range(args.destinations)],
+        "k": 10
+    }
+    rows.append(measure("get_directions (pair)", lambda: client.post("/api/directions", json=pair), args.repeat))
+    rows.append(measure(
+        f"get_directions (1 x {args.destinations}, k=10)",
+        lambda: client.post("/api/directions", json=batch), args.repeat
+    ))
+
+    print(f"\npeak RSS {peak_rss_mb():.1f} MB")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "benchmarks": rows, "peak_rss_mb": peak_rss_mb()}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
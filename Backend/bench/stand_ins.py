@@ -0,0 +1,110 @@
+"""Local stand-ins for Groq and MongoDB, so the backend can be benchmarked offline.
+
+load_backend() patches the chat model factory and, unless a MongoDB URI is
+given, the MongoDB client before importing app.py, and returns the imported
+module. Call it before anything else imports app.
+"""
+import os
+import sys
+import time
+import resource
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_REPLY = (
+    "For a mild headache, drink plenty of water, rest in a quiet dark room and try a cold "
+    "compress on your forehead. Ginger or peppermint tea can also help. If the pain is "
+    "severe, sudden or comes with fever, a stiff neck or vision changes, please seek "
+    "professional medical help right away."
+)
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers with a fixed reply after a simulated delay.
+
+    Each call waits latency seconds before the first token, then emits the reply
+    word by word at tokens_per_second (0 means all at once).
+    """
+
+    reply: str = DEFAULT_REPLY
+    latency: float = 0.3
+    tokens_per_second: float = 200.0
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _tokens(self):
+        words = self.reply.split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def _token_delay(self):
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency + self._token_delay() * len(self._tokens()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for token in self._tokens():
+            time.sleep(self._token_delay())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+def use_mongomock():
+    import mongomock
+    import mongomock.collection
+    import pymongo
+
+    # pymongo's UpdateOne and ReplaceOne pass sort= to bulk writes, which mongomock does not accept yet
+    add_update = mongomock.collection.BulkOperationBuilder.add_update
+    add_replace = mongomock.collection.BulkOperationBuilder.add_replace
+
+    def add_update_without_sort(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+
+    def add_replace_without_sort(self, *args, sort=None, **kwargs):
+        return add_replace(self, *args, **kwargs)
+
+    mongomock.collection.BulkOperationBuilder.add_update = add_update_without_sort
+    mongomock.collection.BulkOperationBuilder.add_replace = add_replace_without_sort
+    pymongo.MongoClient = mongomock.MongoClient
+
+
+def load_backend(latency=0.3, tokens_per_second=200.0, mongo_uri=None):
+    """Import app.py against the fake model and an in-process or local MongoDB."""
+    import langchain.chat_models
+
+    langchain.chat_models.init_chat_model = lambda *args, **kwargs: FakeChatModel(
+        latency=latency, tokens_per_second=tokens_per_second
+    )
+    if mongo_uri:
+        os.environ["MONGO_URI"] = mongo_uri
+    else:
+        use_mongomock()
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    # Every virtual user connects from the same address
+    os.environ.setdefault("AUTH_IP_LIMIT", "1000000")
+
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    import app
+    return app
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
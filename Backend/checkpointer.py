@@ -0,0 +1,235 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+
+from langgraph.checkpoint.memory import MemorySaver
+
+logger = logging.getLogger(__name__)
+
+# Number of locks that serialize MongoDB I/O per thread_id (thread_ids share them by hash)
+IO_LOCK_STRIPES = 64
+
+
+class BoundedMongoSaver(MemorySaver):
+    """MemorySaver with LRU/TTL eviction that writes threads through to MongoDB.
+
+    Each thread's recent checkpoints are kept in memory as a cache and mirrored to one
+    document per thread in ``collection``. Idle threads are evicted once they exceed
+    ``ttl_seconds``, or least recently used first when the cache holds more than
+    ``max_threads`` threads or ``max_bytes`` of serialized state. Evicted threads are
+    reloaded from MongoDB on demand. With ``shared=True`` every read checks the
+    stored version first, so several worker processes can serve the same thread_id.
+
+    Only checkpoints are written through; pending writes stay in memory, since they
+    only matter for resuming a step that was interrupted inside this process.
+    Without a collection it behaves as a bounded in-memory saver.
+
+    ``lock`` only guards the in-memory cache and is never held across a MongoDB round
+    trip. Reads and writes of one thread_id are kept in order by a per-thread I/O lock
+    instead, so a slow query for one conversation does not stall the others.
+    """
+
+    def __init__(self, collection=None, max_threads=1000, max_bytes=64 * 1024 * 1024,
+                 ttl_seconds=1800, keep_checkpoints=2, shared=True, serde=None):
+        super().__init__(serde=serde)
+        self.collection = collection
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.keep_checkpoints = keep_checkpoints
+        self.shared = shared
+        self.lock = threading.RLock()
+        self.io_locks = [threading.Lock() for _ in range(IO_LOCK_STRIPES)]
+        # thread_id -> {"last_used", "bytes", "version"}, least recently used first
+        self.threads = OrderedDict()
+        self.total_bytes = 0
+
+    # ----- CheckpointSaver interface -----
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        with self._io_lock(thread_id):
+            self._sync(thread_id)
+            with self.lock:
+                return super().get_tuple(config)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        # Without a config this only lists threads currently held in memory.
+        if config:
+            thread_id = config["configurable"]["thread_id"]
+            with self._io_lock(thread_id):
+                self._sync(thread_id)
+                with self.lock:
+                    items = list(super().list(config, filter=filter, before=before, limit=limit))
+        else:
+            with self.lock:
+                items = list(super().list(config, filter=filter, before=before, limit=limit))
+        yield from items
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        with self._io_lock(thread_id):
+            with self.lock:
+                next_config = super().put(config, checkpoint, metadata, new_versions)
+                self._prune(thread_id)
+                self._track(thread_id, checkpoint["id"])
+                document = self._document(thread_id)
+                self._evict(keep=thread_id)
+            self._persist(thread_id, document)
+            return next_config
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        with self.lock:
+            super().put_writes(config, writes, task_id, task_path)
+            if thread_id in self.threads:
+                self._track(thread_id, self.threads[thread_id]["version"])
+
+    # The async variants run the sync methods on a worker thread, because they may
+    # block on MongoDB.
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id):
+        """Drop a thread from memory and from MongoDB."""
+        with self._io_lock(thread_id):
+            with self.lock:
+                self._drop(thread_id)
+            if self.collection is not None:
+                try:
+                    self.collection.delete_one({"_id": thread_id})
+                except Exception as e:
+                    logger.error(f"Failed to delete checkpoints for thread {thread_id}: {e}")
+
+    def _io_lock(self, thread_id):
+        return self.io_locks[hash(thread_id) % len(self.io_locks)]
+
+    # ----- Cache bookkeeping -----
+    # These expect the caller to hold self.lock
+    def _thread_bytes(self, thread_id):
+        size = 0
+        for checkpoints in self.storage.get(thread_id, {}).values():
+            for checkpoint, metadata, _ in checkpoints.values():
+                size += len(checkpoint[1]) + len(metadata[1])
+        for key, writes in self.writes.items():
+            if key[0] == thread_id:
+                size += sum(len(w[2][1]) for w in writes.values())
+        return size
+
+    def _track(self, thread_id, version):
+        entry = self.threads.pop(thread_id, None)
+        if entry is not None:
+            self.total_bytes -= entry["bytes"]
+        size = self._thread_bytes(thread_id)
+        self.threads[thread_id] = {"last_used": time.monotonic(), "bytes": size, "version": version}
+        self.total_bytes += size
+
+    def _touch(self, thread_id):
+        self.threads[thread_id]["last_used"] = time.monotonic()
+        self.threads.move_to_end(thread_id)
+
+    def _prune(self, thread_id):
+        for checkpoint_ns, checkpoints in self.storage[thread_id].items():
+            stale = sorted(checkpoints)[:-self.keep_checkpoints]
+            for checkpoint_id in stale:
+                del checkpoints[checkpoint_id]
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+    def _drop(self, thread_id):
+        entry = self.threads.pop(thread_id, None)
+        if entry is not None:
+            self.total_bytes -= entry["bytes"]
+        self.storage.pop(thread_id, None)
+        for key in [k for k in self.writes if k[0] == thread_id]:
+            del self.writes[key]
+
+    def _evict(self, keep=None):
+        deadline = time.monotonic() - self.ttl_seconds
+        while self.threads:
+            thread_id, entry = next(iter(self.threads.items()))
+            over_limit = len(self.threads) > self.max_threads or self.total_bytes > self.max_bytes
+            if thread_id == keep or not (over_limit or entry["last_used"] < deadline):
+                break
+            self._drop(thread_id)
+            logger.debug("Evicted checkpoint thread %s from memory", thread_id)
+
+    # ----- MongoDB write-through -----
+    # These run under the thread's I/O lock but outside self.lock
+    def _document(self, thread_id):
+        """Snapshot a thread's checkpoints for _persist; call with self.lock held."""
+        if self.collection is None:
+            return None
+        checkpoints = [
+            {
+                "ns": checkpoint_ns,
+                "id": checkpoint_id,
+                "checkpoint": list(checkpoint),
+                "metadata": list(metadata),
+                "parent": parent_id
+            }
+            for checkpoint_ns, saved in self.storage[thread_id].items()
+            for checkpoint_id, (checkpoint, metadata, parent_id) in saved.items()
+        ]
+        return {
+            "checkpoints": checkpoints,
+            "version": self.threads[thread_id]["version"],
+            "updated_at": time.time()
+        }
+
+    def _persist(self, thread_id, document):
+        if document is None:
+            return
+        try:
+            self.collection.replace_one({"_id": thread_id}, document, upsert=True)
+        except Exception as e:
+            logger.error(f"Failed to persist checkpoint for thread {thread_id}: {e}")
+
+    def _sync(self, thread_id):
+        """Make sure the in-memory copy of a thread is current before reading it."""
+        with self.lock:
+            cached = self.threads.get(thread_id)
+            version = cached["version"] if cached is not None else None
+            if self.collection is None or (cached is not None and not self.shared):
+                if cached is not None:
+                    self._touch(thread_id)
+                self._evict()
+                return
+
+        try:
+            if cached is not None:
+                stored = self.collection.find_one({"_id": thread_id}, {"version": 1})
+                if stored is None or stored.get("version") == version:
+                    with self.lock:
+                        # Another thread may have evicted it during the query
+                        if thread_id in self.threads:
+                            self._touch(thread_id)
+                            return
+            doc = self.collection.find_one({"_id": thread_id})
+        except Exception as e:
+            logger.error(f"Failed to load checkpoint for thread {thread_id}: {e}")
+            return
+
+        if doc is None:
+            return
+        with self.lock:
+            self._drop(thread_id)
+            for saved in doc.get("checkpoints", []):
+                self.storage[thread_id][saved["ns"]][saved["id"]] = (
+                    tuple(saved["checkpoint"]),
+                    tuple(saved["metadata"]),
+                    saved.get("parent")
+                )
+            self._track(thread_id, doc.get("version"))
+            self._evict(keep=thread_id)
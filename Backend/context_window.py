@@ -0,0 +1,100 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ----- Context window settings -----
+# Token counts are estimated (roughly four characters per token for English text),
+# which is close enough for budgeting without pulling in a tokenizer.
+CHARS_PER_TOKEN = 4
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "300"))
+# When the window overflows, older turns are folded until the recent turns fit in
+# this fraction of the budget, so the summary is refreshed every few turns rather
+# than on every message.
+CONTEXT_RETAIN_RATIO = float(os.getenv("CONTEXT_RETAIN_RATIO", "0.6"))
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a patient and a healthcare bot. "
+    "Merge the new conversation into the existing summary. Keep symptoms, their duration, "
+    "medications, allergies and advice already given. Reply with the summary only, in under "
+    f"{SUMMARY_TOKEN_BUDGET * CHARS_PER_TOKEN // 6} words."
+)
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def message_text(msg):
+    return msg.get('content') or msg.get('messages') or ''
+
+
+def empty_summary():
+    return {"text": "", "covered": 0}
+
+
+def split_recent(messages, budget, start=0):
+    """Return the index from which messages[index:] fits in the token budget.
+
+    The newest message is always kept, even if it alone exceeds the budget.
+    """
+    used = 0
+    index = len(messages)
+    while index > start:
+        cost = estimate_tokens(message_text(messages[index - 1]))
+        if used + cost > budget and index < len(messages):
+            break
+        used += cost
+        index -= 1
+    return index
+
+
+def format_transcript(messages):
+    lines = []
+    for msg in messages:
+        speaker = "Patient" if msg.get('sender') == 'user' else "Assistant"
+        lines.append(f"{speaker}: {message_text(msg)}")
+    return "\n".join(lines)
+
+
+def truncate_summary(text):
+    limit = SUMMARY_TOKEN_BUDGET * CHARS_PER_TOKEN
+    return text if len(text) <= limit else "..." + text[-limit:]
+
+
+def fold_into_summary(summary_text, messages, summarize=None):
+    """Merge messages into the running summary text.
+
+    summarize(summary_text, transcript) is normally backed by the chat model; if it
+    is missing or fails, the transcript is appended and the result truncated.
+    """
+    transcript = format_transcript(messages)
+    if summarize is not None:
+        try:
+            return truncate_summary(summarize(summary_text, transcript).strip())
+        except Exception as e:
+            logger.error(f"Summarization failed, keeping extractive summary: {e}")
+    return truncate_summary(f"{summary_text}\n{transcript}".strip())
+
+
+def build_context(messages, summary=None, summarize=None, budget=CONTEXT_TOKEN_BUDGET, offset=0):
+    """Split a session's stored messages into a running summary and a recent window.
+
+    summary is the {"text", "covered"} dict stored on the session, where covered is
+    the number of leading messages already folded into the text. messages may start
+    part-way through the session; offset is the sequence number of messages[0].
+    Returns (summary, recent_messages, changed); changed tells the caller to persist
+    the new summary.
+    """
+    summary = summary or empty_summary()
+    covered = min(max(summary.get("covered", 0) - offset, 0), len(messages))
+    recent_budget = max(budget - SUMMARY_TOKEN_BUDGET, 1)
+
+    if split_recent(messages, recent_budget, covered) <= covered:
+        return summary, messages[covered:], False
+
+    fold_until = split_recent(messages, int(recent_budget * CONTEXT_RETAIN_RATIO), covered)
+    text = fold_into_summary(summary.get("text", ""), messages[covered:fold_until], summarize)
+    logger.debug("Folded %d messages into the session summary", fold_until - covered)
+    return {"text": text, "covered": offset + fold_until}, messages[fold_until:], True
@@ -0,0 +1,98 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+class FallbackEngine:
+    """Keyword rules used to answer when the model is unavailable.
+
+    Rules are loaded from a JSON file ({"default": str, "rules": [{"keywords",
+    "priority", "response"}]}) and compiled into a phrase -> rule table. A message is
+    matched in a single pass over its words by looking up every word n-gram up to the
+    longest keyword, so matching cost depends on the message length, not on the
+    number of rules. Keywords match whole words only ("hi" does not match "chills"),
+    and the highest-priority match wins, ties going to the earliest match.
+
+    The file is re-read when its modification time changes (checked at most every
+    reload_interval seconds); a file that fails to parse leaves the current rules
+    in place.
+    """
+
+    def __init__(self, path, reload_interval=1.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.lock = threading.Lock()
+        self.phrases = {}
+        self.max_words = 1
+        self.default = ""
+        self.mtime = None
+        self.checked_at = 0.0
+        self.reload()
+
+    def reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            phrases, max_words = self.compile(data["rules"])
+        except Exception as e:
+            logger.error(f"Failed to load fallback rules from {self.path}: {e}")
+            return False
+
+        with self.lock:
+            self.phrases = phrases
+            self.max_words = max_words
+            self.default = data.get("default", "")
+            self.mtime = mtime
+        logger.info("Loaded %d fallback rules (%d keywords)", len(data["rules"]), len(phrases))
+        return True
+
+    @staticmethod
+    def compile(rules):
+        phrases = {}
+        max_words = 1
+        for rule in rules:
+            entry = (rule.get("priority", 0), rule["response"])
+            for keyword in rule["keywords"]:
+                words = tuple(WORD_PATTERN.findall(keyword.lower()))
+                if not words:
+                    continue
+                # If two rules share a keyword, keep the higher priority one.
+                if words not in phrases or phrases[words][0] < entry[0]:
+                    phrases[words] = entry
+                max_words = max(max_words, len(words))
+        return phrases, max_words
+
+    def reload_if_changed(self):
+        now = time.monotonic()
+        if now - self.checked_at < self.reload_interval:
+            return
+        self.checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime != self.mtime:
+            # Remember the attempt so a broken file is not re-parsed until it changes again.
+            self.mtime = mtime
+            self.reload()
+
+    def match(self, user_input):
+        self.reload_if_changed()
+        phrases, max_words, default = self.phrases, self.max_words, self.default
+
+        words = WORD_PATTERN.findall(user_input.lower())
+        best = None
+        for start in range(len(words)):
+            for length in range(1, min(max_words, len(words) - start) + 1):
+                entry = phrases.get(tuple(words[start:start + length]))
+                if entry is not None and (best is None or entry[0] > best[0]):
+                    best = entry
+        return best[1] if best else default
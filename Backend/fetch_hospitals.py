@@ -0,0 +1,83 @@
+"""Build the local hospital dataset served by /api/hospitals/nearby.
+
+Downloads every amenity=hospital in a country (ISO 3166-1 code) or a bounding
+box from OpenStreetMap's Overpass API and writes it as a CSV (name, lat, lon)
+that HospitalIndex.load reads:
+
+    python fetch_hospitals.py --country IN
+    python fetch_hospitals.py --bbox 28.40,76.84,28.88,77.35 -o data/delhi.csv
+
+The backend reads data/hospitals.csv by default (HOSPITALS_DATA overrides it)
+and loads it at startup; restart after refreshing the file.
+"""
+import os
+import csv
+import sys
+import json
+import argparse
+import urllib.parse
+import urllib.request
+
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "hospitals.csv")
+
+
+def build_query(country=None, bbox=None, timeout=300):
+    if country:
+        area = f'area["ISO3166-1"="{country.upper()}"][admin_level=2]->.searchArea;'
+        scope = "(area.searchArea)"
+    else:
+        area = ""
+        scope = f"({bbox})"
+    return (
+        f"[out:json][timeout:{timeout}];{area}"
+        f'(node["amenity"="hospital"]{scope};way["amenity"="hospital"]{scope};relation["amenity"="hospital"]{scope};);'
+        "out center tags;"
+    )
+
+
+def fetch(query, url=OVERPASS_URL, timeout=300):
+    data = urllib.parse.urlencode({"data": query}).encode()
+    request = urllib.request.Request(url, data=data, headers={"User-Agent": "HealthAssist hospital dataset loader"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.load(response)["elements"]
+
+
+def rows(elements):
+    for element in elements:
+        point = element if "lat" in element else element.get("center")
+        if not point:
+            continue
+        name = (element.get("tags") or {}).get("name") or "Hospital"
+        yield name, point["lat"], point["lon"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download hospitals from OpenStreetMap into a CSV dataset.")
+    where = parser.add_mutually_exclusive_group(required=True)
+    where.add_argument("--country", help="ISO 3166-1 alpha-2 country code, e.g. IN")
+    where.add_argument("--bbox", help="south,west,north,east in degrees")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--url", default=OVERPASS_URL, help="Overpass API endpoint")
+    args = parser.parse_args(argv)
+
+    try:
+        elements = fetch(build_query(args.country, args.bbox), args.url)
+    except Exception as e:
+        print(f"Overpass request failed: {e}", file=sys.stderr)
+        return 1
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    count = 0
+    with open(args.output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "lat", "lon"])
+        for row in rows(elements):
+            writer.writerow(row)
+            count += 1
+    print(f"Wrote {count} hospitals to {args.output}")
+    return 0 if count else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import csv
+import json
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000
+# Average driving speed (50 km/h ≈ 13.89 m/s) plus 30% for traffic and stops
+AVERAGE_SPEED_MPS = 13.89
+TRAFFIC_FACTOR = 1.3
+
+
+def to_lon_lat_array(coordinates):
+    """Validate a list of [lon, lat] pairs into an (n, 2) float array."""
+    points = np.asarray(coordinates, dtype=np.float64)
+    if points.ndim != 2 or points.shape[1] != 2:
+        raise ValueError("Coordinates must be a list of [longitude, latitude] pairs")
+    if not np.isfinite(points).all() or (np.abs(points[:, 1]) > 90).any() or (np.abs(points[:, 0]) > 180).any():
+        raise ValueError("Coordinates out of range")
+    return points
+
+
+def haversine_matrix(origins, destinations):
+    """Great-circle distances in meters between every origin and destination.
+
+    origins and destinations are (m, 2) and (n, 2) arrays of [lon, lat] in degrees;
+    the result is an (m, n) array.
+    """
+    lon1, lat1 = np.radians(origins[:, 0])[:, None], np.radians(origins[:, 1])[:, None]
+    lon2, lat2 = np.radians(destinations[:, 0])[None, :], np.radians(destinations[:, 1])[None, :]
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def estimate_duration(distance_meters):
+    return distance_meters / AVERAGE_SPEED_MPS * TRAFFIC_FACTOR
+
+
+def nearest_indices(distances, k=None):
+    """Column indices of each row sorted by distance, truncated to the nearest k."""
+    n = distances.shape[1]
+    if k is not None and k < n:
+        candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(distances, candidates, axis=1).argsort(axis=1)
+        return np.take_along_axis(candidates, order, axis=1)
+    return distances.argsort(axis=1)
+
+
+
+def unit_vectors(lon_lat):
+    """Map [lon, lat] degrees onto points of the unit sphere."""
+    lon, lat = np.radians(lon_lat[:, 0]), np.radians(lon_lat[:, 1])
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def chord_length(distance_meters):
+    """Straight-line distance on the unit sphere matching a great-circle distance."""
+    return 2 * np.sin(np.minimum(distance_meters / EARTH_RADIUS_M, np.pi) / 2)
+
+
+class HospitalIndex:
+    """In-memory nearest-hospital index over a local dataset.
+
+    Hospitals are stored as a KD-tree over unit-sphere vectors. Straight-line
+    (chord) distance there is monotonic in great-circle distance, so nearest-k and
+    radius queries are exact. Results are then ranked with the same haversine/ETA
+    estimate as /api/directions. Coordinates are float64 arrays plus a list of
+    names, about 50 bytes per hospital, so country-scale extracts fit easily.
+    """
+
+    def __init__(self, lon_lat, names):
+        # Deferred: SciPy is only needed once a hospital dataset is loaded
+        from scipy.spatial import cKDTree
+
+        self.lon_lat = lon_lat
+        self.names = names
+        self.tree = cKDTree(unit_vectors(lon_lat))
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def load(cls, path):
+        """Load a CSV (name, lat/latitude, lon/lng/longitude columns) or GeoJSON file."""
+        if path.lower().endswith((".geojson", ".json")):
+            lon_lat, names = read_geojson(path)
+        else:
+            lon_lat, names = read_csv(path)
+        if not names:
+            raise ValueError(f"No hospitals found in {path}")
+        return cls(to_lon_lat_array(lon_lat).reshape(-1, 2), names)
+
+    def nearest(self, lon, lat, k=10, radius_meters=None):
+        """Up to k hospitals nearest to (lon, lat), optionally within radius_meters."""
+        k = min(k, len(self))
+        if k == 0:
+            return []
+        point = unit_vectors(np.array([[lon, lat]]))[0]
+
+        if radius_meters is None:
+            _, indices = self.tree.query(point, k=k)
+            indices = np.atleast_1d(indices)
+        else:
+            indices = np.asarray(self.tree.query_ball_point(point, chord_length(radius_meters)), dtype=np.int64)
+        if len(indices) == 0:
+            return []
+
+        distances = haversine_matrix(np.array([[lon, lat]]), self.lon_lat[indices])[0]
+        order = nearest_indices(distances[None, :], k)[0]
+        durations = estimate_duration(distances)
+        return [
+            {
+                "name": self.names[indices[i]],
+                "lon": float(self.lon_lat[indices[i], 0]),
+                "lat": float(self.lon_lat[indices[i], 1]),
+                "distance": float(distances[i]),
+                "duration": float(durations[i])
+            }
+            for i in order
+        ]
+
+
+def read_csv(path):
+    lon_lat, names = [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            row = {key.strip().lower(): value for key, value in row.items() if key}
+            lat = row.get("lat") or row.get("latitude")
+            lon = row.get("lon") or row.get("lng") or row.get("longitude")
+            if not lat or not lon:
+                continue
+            lon_lat.append((float(lon), float(lat)))
+            names.append(row.get("name") or "Hospital")
+    return lon_lat, names
+
+
+def read_geojson(path):
+    with open(path, encoding="utf-8") as f:
+        features = json.load(f).get("features", [])
+
+    lon_lat, names = [], []
+    for feature in features:
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") == "Point":
+            lon, lat = geometry["coordinates"][:2]
+        elif geometry.get("type") == "Polygon":
+            # OSM extracts map many hospitals as building outlines; use the outline's mean
+            ring = np.asarray(geometry["coordinates"][0], dtype=np.float64)[:, :2]
+            lon, lat = ring[:-1].mean(axis=0) if len(ring) > 1 else ring[0]
+        else:
+            continue
+        lon_lat.append((float(lon), float(lat)))
+        names.append((feature.get("properties") or {}).get("name") or "Hospital")
+    return lon_lat, names
@@ -0,0 +1,155 @@
+"""MongoDB indexes for the Chatbot database, and a query-plan check for the hot queries.
+
+The backend calls ensure_indexes() at startup. Run this module directly to create
+the indexes and explain() every hot query; it exits non-zero if any of them falls
+back to a collection scan:
+
+    python indexes.py [--uri mongodb://localhost:27017/]
+"""
+import os
+import sys
+import logging
+import argparse
+
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# collection -> [(keys, options)]
+INDEXES = {
+    "Chats": [
+        # get_sessions: find({"user_email"}).sort([("last_updated", -1), ("session_id", -1)]),
+        # keyset pages on the same keys, and the sidebar version lookup
+        ([("user_email", ASCENDING), ("last_updated", DESCENDING), ("session_id", DESCENDING)],
+         {"name": "user_email_last_updated_session_id"}),
+        # session header lookups, append_batch upsert and delete_session; unique so two
+        # create_session or append_batch upserts for one session cannot both insert a header
+        ([("session_id", ASCENDING)], {"name": "session_id_unique", "unique": True}),
+    ],
+    "Users": [
+        # login, signup and check-auth; unique so concurrent signups cannot both insert
+        ([("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+    ],
+    "ResponseCache": [
+        # shared response cache tier; MongoDB removes entries once expires_at passes
+        ([("expires_at", ASCENDING)], {"name": "expires_at_ttl", "expireAfterSeconds": 0}),
+    ],
+    "ImportStaging": [
+        # HistoryImporter switching a session over, and its cleanup
+        ([("import_id", ASCENDING), ("session_id", ASCENDING)], {"name": "import_id_session_id"}),
+        # buckets left behind by an import that failed part way
+        ([("staged_at", ASCENDING)], {"name": "staged_at_ttl", "expireAfterSeconds": 86400}),
+    ],
+    # Messages and Checkpoints are only ever read by _id.
+}
+
+PROBE_EMAIL = "probe@example.com"
+PROBE_SESSION = "probe-session"
+
+# name -> explain command for each hot query, shaped like the query the backend issues
+HOT_QUERIES = {
+    "get_sessions": {
+        "find": "Chats",
+        "filter": {"user_email": PROBE_EMAIL},
+        "sort": {"last_updated": -1, "session_id": -1},
+        "projection": {"_id": 0, "session_id": 1, "last_updated": 1, "title": 1, "message_count": 1, "last_snippet": 1},
+        "limit": 51,
+    },
+    "get_sessions_version": {
+        "find": "Chats",
+        "filter": {"user_email": PROBE_EMAIL},
+        "sort": {"last_updated": -1},
+        "projection": {"_id": 0, "last_updated": 1},
+        "limit": 1,
+    },
+    "get_session_header": {
+        "find": "Chats",
+        "filter": {"session_id": PROBE_SESSION, "user_email": PROBE_EMAIL},
+        "limit": 1,
+    },
+    "append_batch": {
+        "findAndModify": "Chats",
+        "query": {"session_id": PROBE_SESSION},
+        "update": [{"$set": {"message_count": {"$add": [{"$ifNull": ["$message_count", 0]}, 1]}}}],
+        "upsert": True,
+        "new": True,
+    },
+    "delete_session": {
+        "findAndModify": "Chats",
+        "query": {"session_id": PROBE_SESSION, "user_email": PROBE_EMAIL},
+        "remove": True,
+    },
+    "load_messages": {
+        "find": "Messages",
+        "filter": {"_id": {"$in": [f"{PROBE_SESSION}:0", f"{PROBE_SESSION}:1"]}},
+    },
+    "find_user": {
+        "find": "Users",
+        "filter": {"email": PROBE_EMAIL},
+        "limit": 1,
+    },
+}
+
+
+def ensure_indexes(db):
+    """Create the declared indexes; returns the names of any that failed."""
+    failed = []
+    for collection_name, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                db[collection_name].create_index(keys, **options)
+            except OperationFailure as e:
+                # Most likely existing duplicates blocking a unique index.
+                logger.error(f"Failed to create index {collection_name}.{options['name']}: {e}")
+                failed.append(options["name"])
+    return failed
+
+
+def plan_stages(plan):
+    """Yield every stage name in an explain() plan tree."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for key in ("inputStage", "queryPlan", "winningPlan"):
+            if key in plan:
+                yield from plan_stages(plan[key])
+        for child in plan.get("inputStages", []):
+            yield from plan_stages(child)
+
+
+def explain_hot_queries(db):
+    """Return {query name: [stages of the winning plan]} for every hot query."""
+    results = {}
+    for name, command in HOT_QUERIES.items():
+        explained = db.command({"explain": command, "verbosity": "queryPlanner"})
+        results[name] = list(plan_stages(explained["queryPlanner"]["winningPlan"]))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create MongoDB indexes and verify the hot query plans.")
+    parser.add_argument("--uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--db", default="Chatbot")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    db = MongoClient(args.uri, serverSelectionTimeoutMS=5000)[args.db]
+
+    failed_indexes = ensure_indexes(db)
+    collscans = []
+    for name, stages in explain_hot_queries(db).items():
+        status = "COLLSCAN" if "COLLSCAN" in stages else "ok"
+        print(f"{status:9} {name}: {' <- '.join(stages)}")
+        if status == "COLLSCAN":
+            collscans.append(name)
+
+    if failed_indexes:
+        print(f"Indexes not created: {', '.join(failed_indexes)}", file=sys.stderr)
+    if collscans:
+        print(f"Queries falling back to a collection scan: {', '.join(collscans)}", file=sys.stderr)
+    return 1 if failed_indexes or collscans else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+import logging.handlers
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else was passed through extra= and is
+# emitted as a structured field.
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Samples DEBUG records and rate-limits chatty call sites.
+
+    DEBUG records pass with probability debug_sample_rate. Records at INFO and
+    below are also limited to max_per_second per call site (logger, message
+    template); WARNING and above always pass.
+    """
+
+    def __init__(self, debug_sample_rate=1.0, max_per_second=0):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+        self.max_per_second = max_per_second
+        # (logger, template) -> [window start, count]
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        if record.levelno <= logging.DEBUG and self.debug_sample_rate < 1 and random.random() >= self.debug_sample_rate:
+            return False
+        if not self.max_per_second:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= 1:
+                if len(self.windows) > 10000:
+                    self.windows.clear()
+                self.windows[key] = [now, 1]
+                return True
+            window[1] += 1
+            return window[1] <= self.max_per_second
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread.
+
+    When a bounded queue is full the record is dropped rather than blocking the
+    caller or reporting an error, and on_drop() is called.
+    """
+
+    def __init__(self, records, on_drop=None):
+        super().__init__(records)
+        self.on_drop = on_drop
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.on_drop is not None:
+                self.on_drop()
+
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """QueueListener whose stop() waits for room in a full queue instead of raising."""
+
+    def enqueue_sentinel(self):
+        if self._thread is not None:
+            self.queue.put(self._sentinel)
+
+
+def setup_logging(on_drop=None):
+    """Route all logging through a queue to a background writer thread.
+
+    The request thread only filters the record and puts it on the queue; the
+    listener formats it (JSON unless LOG_FORMAT=text) and writes it to stderr.
+    LOG_LEVEL sets the level, LOG_DEBUG_SAMPLE_RATE the fraction of DEBUG
+    records kept and LOG_RATE_LIMIT the per-call-site cap per second.
+    LOG_QUEUE_SIZE bounds the queue (0, the default, leaves it unbounded); records
+    that find it full are dropped and counted through on_drop.
+    """
+    root = logging.getLogger()
+    if any(isinstance(handler, DeferredQueueHandler) for handler in root.handlers):
+        return
+
+    stream = logging.StreamHandler(sys.stderr)
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        stream.setFormatter(JsonFormatter())
+
+    records = queue.Queue(int(os.getenv("LOG_QUEUE_SIZE", "0")))
+    handler = DeferredQueueHandler(records, on_drop)
+    handler.addFilter(SamplingFilter(
+        debug_sample_rate=float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1")),
+        max_per_second=int(os.getenv("LOG_RATE_LIMIT", "0"))
+    ))
+    listener = DrainingQueueListener(records, stream, respect_handler_level=True)
+
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    listener.start()
+    atexit.register(listener.stop)
+
+
+LOG_MESSAGE_CONTENT = os.getenv("LOG_MESSAGE_CONTENT", "false").lower() == "true"
+
+
+def redact(text, limit=100):
+    """Chat text for a log line: withheld unless LOG_MESSAGE_CONTENT=true, since it may hold symptoms."""
+    if LOG_MESSAGE_CONTENT:
+        return text[:limit]
+    return f"<{len(text)} chars>"
@@ -0,0 +1,221 @@
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # label values -> [per-bucket counts, sum, count]
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = format_labels(self.labelnames, key, [("le", format_value(float(bound)))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{format_labels(self.labelnames, key)} {format_value(total)}")
+                lines.append(f"{self.name}_count{format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time."""
+
+    def __init__(self, name, help, read):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self):
+        try:
+            value = self.read()
+        except Exception as e:
+            logger.error(f"Failed to read gauge {self.name}: {e}")
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {format_value(value)}"]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_seconds = registry.register(Histogram(
+    "healthassist_request_seconds", "HTTP request latency.", ("method", "route", "status")
+))
+phase_seconds = registry.register(Histogram(
+    "healthassist_phase_seconds", "Time spent in each phase of a request.", ("phase",)
+))
+mongo_seconds = registry.register(Histogram(
+    "healthassist_mongo_command_seconds", "MongoDB command latency.", ("command", "outcome")
+))
+llm_tokens = registry.register(Histogram(
+    "healthassist_llm_tokens", "Tokens per model call.", ("kind",), buckets=TOKEN_BUCKETS
+))
+fallbacks = registry.register(Counter(
+    "healthassist_fallback_responses_total", "Replies served by the fallback engine instead of the model."
+))
+slow_requests = registry.register(Counter(
+    "healthassist_slow_requests_total", "Requests slower than the slow-request threshold."
+))
+log_records_dropped = registry.register(Counter(
+    "healthassist_log_records_dropped_total", "Log records dropped because the log queue was full."
+))
+triage_alerts = registry.register(Counter(
+    "healthassist_triage_alerts_total", "Messages answered by the emergency triage fast path.", ("category", "source")
+))
+
+
+# ----- Per-request phase timings -----
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """Phase timings for one request; phases that repeat (e.g. Mongo reads) add up."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def breakdown(self):
+        return {phase: round(seconds * 1000, 2) for phase, seconds in self.phases.items()}
+
+
+def start_trace():
+    trace = Trace()
+    current_trace.set(trace)
+    return trace
+
+
+@contextmanager
+def phase(name):
+    """Time a block into healthassist_phase_seconds and the current request's trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        phase_seconds.observe(elapsed, phase=name)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add(name, elapsed)
+
+
+def finish_trace(trace, method, route, status, slow_threshold=None):
+    """Record a request's latency, and log its phase breakdown if it was slow."""
+    elapsed = time.perf_counter() - trace.start
+    request_seconds.observe(elapsed, method=method, route=route, status=str(status))
+    if slow_threshold is not None and elapsed >= slow_threshold:
+        slow_requests.inc()
+        logger.warning(f"Slow request {method} {route} ({status}) took {elapsed * 1000:.1f} ms: {trace.breakdown()}")
+
+
+def record_llm_usage(message):
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        llm_tokens.observe(usage.get("input_tokens", 0), kind="input")
+        llm_tokens.observe(usage.get("output_tokens", 0), kind="output")
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """pymongo command listener feeding Mongo latencies into the metrics and current trace."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.record(event, "ok")
+
+    def failed(self, event):
+        self.record(event, "error")
+
+    def record(self, event, outcome):
+        seconds = event.duration_micros / 1e6
+        mongo_seconds.observe(seconds, command=event.command_name, outcome=outcome)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add("mongo", seconds)
@@ -0,0 +1,78 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Collects concurrent model calls and dispatches them together.
+
+    invoke(prompt) blocks the calling thread until its result is ready. The first
+    prompt to arrive opens a window of `window` seconds; everything that arrives
+    before it closes, up to max_batch prompts, is sent in one call to
+    model.batch(). Each result, or exception, goes back to the request that
+    submitted that prompt. Up to max_in_flight batches run at once, so a slow
+    batch does not hold back the next window.
+    """
+
+    def __init__(self, model, max_batch=8, window=0.005, max_concurrency=None, max_in_flight=8):
+        self.model = model
+        self.max_batch = max_batch
+        self.window = window
+        self.batch_config = {"max_concurrency": max_concurrency} if max_concurrency else None
+        self.condition = threading.Condition()
+        self.items = deque()
+        self.closed = False
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="model-batch")
+        self.thread = threading.Thread(target=self.run, name="model-batcher", daemon=True)
+        self.thread.start()
+
+    def invoke(self, prompt):
+        future = Future()
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("Model batcher is closed")
+            self.items.append((prompt, future))
+            self.condition.notify()
+        return future.result()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.items and not self.closed:
+                    self.condition.wait()
+                if not self.items:
+                    return
+                deadline = time.monotonic() + self.window
+                while len(self.items) < self.max_batch and not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch = [self.items.popleft() for _ in range(min(self.max_batch, len(self.items)))]
+            self.executor.submit(self.dispatch, batch)
+
+    def dispatch(self, batch):
+        prompts = [prompt for prompt, _ in batch]
+        try:
+            results = self.model.batch(prompts, config=self.batch_config, return_exceptions=True)
+        except Exception as e:
+            results = [e] * len(batch)
+        logger.debug("Dispatched a batch of %d model calls", len(batch))
+
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def close(self, timeout=10):
+        """Dispatch whatever is queued and stop the background thread."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join(timeout)
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,236 @@
+import time
+import queue
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the model while the circuit breaker is open."""
+
+    def __init__(self):
+        super().__init__("Model circuit breaker is open")
+
+
+class CircuitBreaker:
+    """Opens once the recent failure rate crosses a threshold.
+
+    Outcomes from the last window_seconds are counted; with at least min_calls of
+    them and a failure rate of failure_rate or more, the circuit opens and allow()
+    returns False for open_seconds. After that a single probe call is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_rate=0.5, min_calls=10, window_seconds=60, open_seconds=30):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window_seconds
+        self.open_seconds = open_seconds
+        self.outcomes = deque()
+        self.state = "closed"
+        self.opened_at = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.open_seconds:
+                self.state = "half_open"
+                logger.info("Model circuit half-open, sending a probe request")
+                return True
+            return False
+
+    def record(self, success):
+        now = time.monotonic()
+        with self.lock:
+            if self.state == "half_open":
+                if success:
+                    self.state = "closed"
+                    self.outcomes.clear()
+                    logger.info("Model circuit closed")
+                else:
+                    self.trip(now)
+                return
+
+            self.outcomes.append((now, success))
+            while self.outcomes and self.outcomes[0][0] < now - self.window:
+                self.outcomes.popleft()
+            failures = sum(1 for _, ok in self.outcomes if not ok)
+            if (self.state == "closed" and len(self.outcomes) >= self.min_calls
+                    and failures / len(self.outcomes) >= self.failure_rate):
+                self.trip(now)
+
+    def trip(self, now):
+        self.state = "open"
+        self.opened_at = now
+        self.outcomes.clear()
+        logger.warning(f"Model circuit opened for {self.open_seconds}s")
+
+
+class LatencyTracker:
+    """Keeps the last max_samples latencies for percentile estimates."""
+
+    def __init__(self, max_samples=200):
+        self.samples = deque(maxlen=max_samples)
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, q, min_samples=20):
+        with self.lock:
+            if len(self.samples) < min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+class GuardedModel:
+    """Deadline, circuit breaker and optional hedging around a model call.
+
+    invoke(prompt) runs primary(prompt) on a worker thread and waits at most
+    `timeout` seconds for an answer. If `backup` is set and the primary has not
+    answered after the hedge delay (the primary's recent p95 latency, or
+    hedge_delay until enough samples exist), backup(prompt) is started as well
+    and whichever answers first wins; a primary that fails outright is hedged
+    immediately. Abandoned calls finish in the background, bounded by the model
+    client's own timeout.
+
+    call(fn) only applies the circuit breaker. It is meant for streaming calls,
+    which must run on the caller's thread and cannot be raced.
+    """
+
+    def __init__(self, primary, breaker, timeout=30, backup=None, hedge_delay=2.0,
+                 hedge_percentile=0.95, max_workers=64):
+        self.primary = primary
+        self.backup = backup
+        self.breaker = breaker
+        self.timeout = timeout
+        self.hedge_delay = hedge_delay
+        self.hedge_percentile = hedge_percentile
+        self.latency = LatencyTracker()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-call")
+
+    def submit(self, fn, prompt):
+        # Run in a copy of the caller's context, so tracing callbacks and the
+        # request's metrics trace follow the call onto the worker thread
+        return self.executor.submit(contextvars.copy_context().run, fn, prompt)
+
+    def current_hedge_delay(self):
+        p = self.latency.percentile(self.hedge_percentile)
+        return self.hedge_delay if p is None else p
+
+    def invoke(self, prompt):
+        if not self.breaker.allow():
+            raise CircuitOpen()
+
+        start = time.monotonic()
+        deadline = start + self.timeout
+        hedge_at = start + self.current_hedge_delay()
+        primary = self.submit(self.primary, prompt)
+        pending = {primary}
+        hedged = self.backup is None
+        error = None
+
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            wait_until = deadline if hedged else min(deadline, hedge_at)
+            done, pending = wait(pending, timeout=max(wait_until - now, 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is primary:
+                        self.latency.add(time.monotonic() - start)
+                    else:
+                        logger.info("Hedged request answered first")
+                    self.breaker.record(True)
+                    return future.result()
+                error = future.exception()
+            if not hedged and (error is not None or time.monotonic() >= hedge_at):
+                pending.add(self.submit(self.backup, prompt))
+                hedged = True
+
+        self.breaker.record(False)
+        if pending:
+            raise TimeoutError(f"Model call exceeded the {self.timeout}s deadline")
+        raise error
+
+    def call(self, fn, *args):
+        if not self.breaker.allow():
+            raise CircuitOpen()
+        try:
+            result = fn(*args)
+        except Exception:
+            self.breaker.record(False)
+            raise
+        self.breaker.record(True)
+        return result
+
+    def stats(self):
+        return {
+            "circuit": self.breaker.state,
+            "hedge_delay_ms": round(self.current_hedge_delay() * 1000),
+            "hedging": self.backup is not None
+        }
+
+
+_END = object()
+
+
+def iterate_with_deadline(items, timeout):
+    """Yield from `items`, raising TimeoutError once `timeout` seconds have passed.
+
+    The iterable is consumed on a daemon thread, in a copy of the caller's
+    context, so a stalled stream is noticed at the deadline rather than when
+    its next item finally arrives. When the caller stops early (deadline,
+    error or close), the thread stops at its next item and closes `items`
+    itself, so the caller never waits on an item still in flight; that wait is
+    bounded by the model client's own timeout.
+    """
+    buffer = queue.Queue()
+    stopped = threading.Event()
+
+    def produce():
+        try:
+            for item in items:
+                if stopped.is_set():
+                    break
+                buffer.put((item, None))
+        except Exception as e:
+            buffer.put((_END, e))
+        else:
+            buffer.put((_END, None))
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception as e:
+                    logger.warning("Closing an abandoned stream failed: %s", e)
+
+    deadline = time.monotonic() + timeout
+    producer = threading.Thread(target=contextvars.copy_context().run, args=(produce,), name="stream", daemon=True)
+    producer.start()
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise queue.Empty
+                item, error = buffer.get(timeout=remaining)
+            except queue.Empty:
+                raise TimeoutError(f"Stream exceeded the {timeout}s deadline") from None
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
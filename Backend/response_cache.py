@@ -0,0 +1,158 @@
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+# Left out of similarity scoring, so that two questions only match on the words that
+# carry their meaning. Negations ("no", "not", "without") are deliberately kept.
+STOPWORDS = frozenset("""
+    a an the and or but if so of to in on at by for from with about as into than then
+    i me my mine myself we our you your he him his she her it its they them their
+    am is are was were be been being have has had having do does did doing
+    this that these those there here what which who whom when where why how
+    can could should would will shall may might must
+    some any very too just also really please get got
+""".split())
+
+
+def normalize_query(text):
+    """Lowercase, drop punctuation and collapse whitespace: "I have a Headache!!" -> "i have a headache"."""
+    return " ".join(WORD_PATTERN.findall(text.lower()))
+
+
+def content_words(key):
+    """The words of a normalized query that are not stopwords."""
+    return frozenset(word for word in key.split() if word not in STOPWORDS)
+
+
+class ResponseCache:
+    """LRU/TTL cache of bot replies to context-free first messages.
+
+    Lookups try an exact match on the normalized query, then the optional shared
+    MongoDB tier, then (if similarity_threshold is set) the closest local entry by
+    Jaccard similarity of their non-stopword words; entries sharing none of those
+    words never match. The shared tier relies on a TTL index on
+    expires_at to expire documents.
+    """
+
+    def __init__(self, max_entries=1000, ttl_seconds=3600, similarity_threshold=None, collection=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.collection = collection
+        self.lock = threading.Lock()
+        # key -> (expires_at, words, response), least recently used first
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.similar_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, query):
+        key = normalize_query(query)
+        if not key or self.max_entries <= 0:
+            return None
+
+        with self.lock:
+            response = self._get_local(key)
+            if response is not None:
+                self.hits += 1
+                return response
+
+        response = self._get_shared(key)
+        with self.lock:
+            if response is not None:
+                self.shared_hits += 1
+                self._put_local(key, response)
+                return response
+
+            response = self._get_similar(key)
+            if response is not None:
+                self.similar_hits += 1
+                return response
+            self.misses += 1
+            return None
+
+    def put(self, query, response):
+        key = normalize_query(query)
+        if not key or self.max_entries <= 0:
+            return
+
+        with self.lock:
+            self._put_local(key, response)
+
+        if self.collection is not None:
+            try:
+                self.collection.replace_one(
+                    {"_id": key},
+                    {"response": response, "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)},
+                    upsert=True
+                )
+            except Exception as e:
+                logger.error(f"Failed to write shared response cache: {e}")
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses
+            }
+
+    # ----- Tiers -----
+    def _get_local(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[2]
+
+    def _put_local(self, key, response):
+        self.entries[key] = (time.monotonic() + self.ttl_seconds, content_words(key), response)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _get_shared(self, key):
+        if self.collection is None:
+            return None
+        try:
+            doc = self.collection.find_one({"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}})
+        except Exception as e:
+            logger.error(f"Failed to read shared response cache: {e}")
+            return None
+        return doc["response"] if doc else None
+
+    def _get_similar(self, key):
+        if not self.similarity_threshold:
+            return None
+
+        words = content_words(key)
+        if not words:
+            return None
+        now = time.monotonic()
+        best_score, best_key = 0.0, None
+        for candidate_key, (expires_at, candidate_words, _) in self.entries.items():
+            if expires_at < now:
+                continue
+            shared = words & candidate_words
+            if not shared:
+                continue
+            score = len(shared) / len(words | candidate_words)
+            if score > best_score:
+                best_score, best_key = score, candidate_key
+
+        if best_key is None or best_score < self.similarity_threshold:
+            return None
+        self.entries.move_to_end(best_key)
+        return self.entries[best_key][2]
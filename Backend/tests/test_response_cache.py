@@ -0,0 +1,23 @@
+import pytest
+
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def cache():
+    cache = ResponseCache(similarity_threshold=0.5)
+    cache.put("What should I do for a headache?", "headache advice")
+    return cache
+
+
+def test_matches_a_rephrased_question(cache):
+    assert cache.get("what do I do about my headache") == "headache advice"
+
+
+@pytest.mark.parametrize("query", [
+    "What should I do for a fever?",
+    "what should i do",
+    "what can I do for my back pain",
+])
+def test_shared_stopwords_do_not_match(cache, query):
+    assert cache.get(query) is None
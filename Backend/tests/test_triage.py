@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from triage import TriageClassifier
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "triage_rules.json")
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return TriageClassifier(RULES_PATH)
+
+
+@pytest.mark.parametrize("text, category", [
+    ("No, I can't breathe!", "breathing"),
+    ("no I cant breathe", "breathing"),
+    ("I'm not sure what's wrong. I can't breathe", "breathing"),
+    ("no fever, but chest pain since morning", "cardiac"),
+    ("my chest hurts", "cardiac"),
+    ("he isn't breathing", "breathing"),
+    ("I think I'm having a stroke", "stroke"),
+    ("Could this be a stroke? Half my face is drooping", "stroke"),
+    ("stroke maybe, my speech is slurred", "stroke"),
+    ("I want to hurt myself", "self_harm"),
+    ("I'm going to hurt myself tonight", "self_harm"),
+    ("I keep thinking about suicide", "self_harm"),
+])
+def test_flags_emergencies(classifier, text, category):
+    result = classifier.classify(text)
+    assert result is not None and result.category == category
+
+
+@pytest.mark.parametrize("text", [
+    "no chest pain, just a cough",
+    "I have no chest pain",
+    "not short of breath at all",
+    "I hurt myself while cutting vegetables",
+    "what a stroke of luck that the clinic was open",
+    "I had a heat stroke last summer",
+    "I have a headache and a mild fever",
+])
+def test_ignores_non_emergencies(classifier, text):
+    assert classifier.classify(text) is None
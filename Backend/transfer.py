@@ -0,0 +1,69 @@
+"""Export a user's chat history to NDJSON, or import such a file.
+
+    python transfer.py export user@example.com -o history.ndjson.gz
+    python transfer.py import history.ndjson.gz
+
+Uses the same MONGO_URI and storage layout as the backend. Files ending in .gz
+are written and read gzip-compressed.
+"""
+import io
+import sys
+import gzip
+import argparse
+import logging
+
+
+def open_file(path, mode):
+    if path == "-":
+        stream = sys.stdout.buffer if "w" in mode else sys.stdin.buffer
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def export(app, args):
+    with open_file(args.output, "w") as f:
+        for line in app.export_history(args.user_email):
+            f.write(line)
+    return 0
+
+
+def import_(app, args):
+    def progress(stats):
+        print(f"{stats['sessions']} sessions, {stats['messages']} messages imported", file=sys.stderr)
+
+    with open_file(args.file, "r") as f:
+        importer = app.HistoryImporter(user_email=args.user_email, batch_messages=args.batch_size, progress=progress)
+        stats = importer.run(f)
+    print(f"Done: {stats['sessions']} sessions, {stats['messages']} messages, "
+          f"{stats['skipped_sessions']} sessions skipped, {stats['invalid_lines']} invalid lines", file=sys.stderr)
+    return 1 if stats["invalid_lines"] else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import chat history as NDJSON.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="write a user's sessions and messages")
+    export_parser.add_argument("user_email")
+    export_parser.add_argument("-o", "--output", default="-", help="file to write, - for stdout")
+    export_parser.set_defaults(run=export)
+
+    import_parser = commands.add_parser("import", help="load an export file")
+    import_parser.add_argument("file", help="file to read, - for stdin")
+    import_parser.add_argument("--user-email", help="import into this account instead of the one in the file")
+    import_parser.add_argument("--batch-size", type=int, default=5000, help="messages per bulk write")
+    import_parser.set_defaults(run=import_)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    import app
+    if app.chat_collection is None:
+        print("MongoDB is not available", file=sys.stderr)
+        return 1
+    return args.run(app, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import re
+import json
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Apostrophes are dropped rather than split on, so "can't" and "cant" are the same word
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+# Punctuation ends a clause, and a negation never reaches past the end of its clause
+CLAUSE_PATTERN = re.compile(r"[.,;:!?…—–\n]+|\s-+\s")
+# How many words before a phrase a negation ("no chest pain") still applies to
+NEGATION_WINDOW = 2
+
+TriageResult = namedtuple("TriageResult", ["category", "response", "source"])
+
+
+def tokenize(text):
+    return WORD_PATTERN.findall(text.lower().replace("'", "").replace("’", ""))
+
+
+def tokenize_clauses(text):
+    """Return the words of text, and the index one past the last word of each clause."""
+    words, ends = [], []
+    for clause in CLAUSE_PATTERN.split(text):
+        words.extend(tokenize(clause))
+        ends.append(len(words))
+    return words, ends
+
+
+class TriageClassifier:
+    """Flags messages describing a medical emergency before they reach the model.
+
+    Rules are loaded once from a JSON file ({"response": str, "negations": [str],
+    "negative_words": [str], "categories": [{"name", "phrases", "all_of", "response"}]})
+    and compiled into
+    lookup tables, so a message is classified in one pass over its words, with
+    n-gram lookups only at words that can start a phrase:
+
+    - phrases match as contiguous words ("cant breathe"), looked up by n-gram;
+    - all_of entries match when every listed word appears anywhere in the
+      message ("pain ... chest").
+
+    A phrase or word preceded within NEGATION_WINDOW words of the same clause by a
+    negation ("no", "not", "without", ...) does not count, so "no chest pain" is not
+    flagged but "No, I can't breathe" is. Phrases that are negative themselves
+    (containing a negation or one of negative_words, e.g. "can't breathe") are
+    never suppressed, so "no I cant breathe" is flagged too.
+
+    If model_path is set, a pickled scikit-learn style classifier (anything with
+    predict_proba over a list of strings) is loaded with joblib and consulted for
+    messages the rules did not flag; a positive-class probability of at least
+    model_threshold counts as an emergency. A model that fails to load leaves
+    the rules working on their own.
+    """
+
+    def __init__(self, path, model_path=None, model_threshold=0.8):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.default_response = data["response"]
+        self.negations = {word for negation in data.get("negations", []) for word in tokenize(negation)}
+        self.phrases, self.max_words, self.combinations = self.compile(data["categories"], self.default_response)
+        negative = self.negations | {word for entry in data.get("negative_words", []) for word in tokenize(entry)}
+        self.negative_phrases = {words for words in self.phrases if negative.intersection(words)}
+        # Only positions holding one of these words can start a phrase
+        self.first_words = {words[0] for words in self.phrases}
+        self.model = self.load_model(model_path) if model_path else None
+        self.model_threshold = model_threshold
+        logger.info("Loaded %d triage categories (%d phrases, %d word combinations)",
+                    len(data["categories"]), len(self.phrases), sum(map(len, self.combinations.values())))
+
+    @staticmethod
+    def compile(categories, default_response):
+        phrases = {}
+        # first word -> [(other words, result)]
+        combinations = {}
+        max_words = 1
+        for category in categories:
+            result = TriageResult(category["name"], category.get("response", default_response), "rules")
+            for phrase in category.get("phrases", []):
+                words = tuple(tokenize(phrase))
+                if words:
+                    phrases.setdefault(words, result)
+                    max_words = max(max_words, len(words))
+            for combination in category.get("all_of", []):
+                words = sorted({word for entry in combination for word in tokenize(entry)})
+                if words:
+                    combinations.setdefault(words[0], []).append((words[1:], result))
+        return phrases, max_words, combinations
+
+    @staticmethod
+    def load_model(model_path):
+        try:
+            # Deferred: joblib and the model's own dependencies are only needed when a model is configured
+            import joblib
+            model = joblib.load(model_path)
+        except Exception as e:
+            logger.error(f"Failed to load triage model from {model_path}, using rules only: {e}")
+            return None
+        logger.info("Loaded triage model from %s", model_path)
+        return model
+
+    def classify(self, text):
+        """Return a TriageResult if the message looks like an emergency, else None."""
+        words, clause_ends = tokenize_clauses(text)
+        negated = set()
+        clause = 0
+        for i, word in enumerate(words):
+            while clause_ends[clause] <= i:
+                clause += 1
+            if word in self.negations:
+                negated.update(range(i + 1, min(i + 1 + NEGATION_WINDOW, clause_ends[clause])))
+
+        for start, word in enumerate(words):
+            if word not in self.first_words:
+                continue
+            for length in range(1, min(self.max_words, len(words) - start) + 1):
+                phrase = tuple(words[start:start + length])
+                result = self.phrases.get(phrase)
+                if result is not None and (start not in negated or phrase in self.negative_phrases):
+                    return result
+
+        if self.combinations:
+            present = {word for i, word in enumerate(words) if i not in negated}
+            for word in present:
+                for others, result in self.combinations.get(word, ()):
+                    if all(other in present for other in others):
+                        return result
+
+        if self.model is not None:
+            return self.classify_with_model(text)
+        return None
+
+    def classify_with_model(self, text):
+        try:
+            probability = self.model.predict_proba([text])[0][-1]
+        except Exception as e:
+            logger.error(f"Triage model failed: {e}")
+            return None
+        if probability >= self.model_threshold:
+            return TriageResult("model", self.default_response, "model")
+        return None
@@ -0,0 +1,103 @@
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """Batches chat turns in memory and writes them from a background thread.
+
+    flush(batch) is called with a list of (session_id, messages, user_email) items,
+    at most max_batch at a time, whenever flush_interval passes or a full batch is
+    waiting. submit() returns False once max_backlog messages are queued, and the
+    caller should then write synchronously, so a slow database applies
+    backpressure instead of growing the queue without bound.
+
+    A failed flush is retried with the same items, so flush must be safe to repeat;
+    it may record progress on the queued message dicts themselves (append_batch
+    stores each message's allocated seq there).
+
+    Unflushed messages are visible through pending_messages(), so this process
+    reads its own writes. Other worker processes only see them after the flush.
+    """
+
+    def __init__(self, flush, max_batch=100, flush_interval=0.05, max_backlog=10000, max_retries=3):
+        self.flush_batch = flush
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_backlog = max_backlog
+        self.max_retries = max_retries
+        self.condition = threading.Condition()
+        self.items = deque()
+        self.backlog = 0
+        # session_id -> messages submitted but not yet written
+        self.pending = {}
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name="write-behind", daemon=True)
+        self.thread.start()
+
+    def submit(self, session_id, messages, user_email=None):
+        with self.condition:
+            if self.closed or self.backlog + len(messages) > self.max_backlog:
+                return False
+            self.items.append((session_id, messages, user_email))
+            self.backlog += len(messages)
+            self.pending.setdefault(session_id, []).extend(messages)
+            if len(self.items) >= self.max_batch:
+                self.condition.notify()
+            return True
+
+    def pending_messages(self, session_id):
+        with self.condition:
+            return list(self.pending.get(session_id, ()))
+
+    def discard(self, session_id):
+        """Drop queued messages for a deleted session."""
+        with self.condition:
+            kept = [item for item in self.items if item[0] != session_id]
+            self.backlog -= sum(len(item[1]) for item in self.items if item[0] == session_id)
+            self.items = deque(kept)
+            self.pending.pop(session_id, None)
+
+    def run(self):
+        while True:
+            with self.condition:
+                if len(self.items) < self.max_batch and not self.closed:
+                    self.condition.wait(self.flush_interval)
+                if not self.items:
+                    if self.closed:
+                        return
+                    continue
+                batch = [self.items.popleft() for _ in range(min(self.max_batch, len(self.items)))]
+            self.write(batch)
+
+    def write(self, batch):
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self.flush_batch(batch)
+                break
+            except Exception as e:
+                logger.error(f"Write-behind flush failed (attempt {attempt}/{self.max_retries}): {e}")
+                time.sleep(self.flush_interval * attempt)
+        else:
+            logger.error(f"Dropping {len(batch)} chat turns after repeated write failures")
+
+        with self.condition:
+            for session_id, messages, _ in batch:
+                self.backlog -= len(messages)
+                pending = self.pending.get(session_id)
+                if pending is None:
+                    continue
+                flushed = {id(msg) for msg in messages}
+                pending[:] = [msg for msg in pending if id(msg) not in flushed]
+                if not pending:
+                    del self.pending[session_id]
+
+    def close(self, timeout=10):
+        """Flush everything still queued and stop the background thread."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join(timeout)
@@ -83,46 +83,75 @@ const EmergencyMap = () => {
     }
   }, []);
 
-  const fetchHospitals = async ([lat, lon]) => {
-    try {
-      setLoading(true);
-      const query = `
-        [out:json];
-        (
-          node["amenity"="hospital"](around:10000,${lat},${lon});
-          way["amenity"="hospital"](around:10000,${lat},${lon});
-          relation["amenity"="hospital"](around:10000,${lat},${lon});
-        );
-        out center;
-      `;
-      const response = await fetch(`https://overpass-api.de/api/interpreter?data=${encodeURIComponent(query)}`);
-      
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-      
-      const data = await response.json();
+  // Nearest hospitals from the backend's local dataset (distance in m, duration in s)
+  const fetchNearbyFromBackend = async ([lat, lon]) => {
+    const response = await fetch(`${API_BASE_URL}/api/hospitals/nearby?lat=${lat}&lon=${lon}&k=25&radius_km=10`);
+    if (response.status === 503) {
+      // No hospital dataset on the server (see Backend/fetch_hospitals.py)
+      return null;
+    }
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
 
-      const rawHospitals = data.elements.map((el) => {
-        const hospitalCoords = el.lat ? [el.lat, el.lon] : [el.center.lat, el.center.lon];
-        const distance = calculateDistance(lat, lon, hospitalCoords[0], hospitalCoords[1]);
-        
-        return {
-          id: el.id,
-          name: el.tags?.name || 'Unnamed Hospital',
-          coords: hospitalCoords,
-          distance: distance,
-          duration: null,
-          loading: false,
-          address: el.tags?.['addr:full'] || el.tags?.['addr:street'] || el.tags?.['addr:city'] || 'Address not available',
-          website: el.tags?.website || null
-        };
-      });
+    const data = await response.json();
+    return data.hospitals.map((hospital, index) => ({
+      id: `${hospital.lat},${hospital.lon},${index}`,
+      name: hospital.name,
+      coords: [hospital.lat, hospital.lon],
+      distance: hospital.distance / 1000,
+      duration: Math.round(hospital.duration / 60),
+      loading: false,
+      address: 'Address not available',
+      website: null
+    }));
+  };
 
-      // Sort hospitals by distance (closest first)
-      rawHospitals.sort((a, b) => a.distance - b.distance);
+  // Fallback when the server has no dataset: query OpenStreetMap's Overpass API directly
+  const fetchNearbyFromOverpass = async ([lat, lon]) => {
+    const query = `
+      [out:json];
+      (
+        node["amenity"="hospital"](around:10000,${lat},${lon});
+        way["amenity"="hospital"](around:10000,${lat},${lon});
+        relation["amenity"="hospital"](around:10000,${lat},${lon});
+      );
+      out center;
+    `;
+    const response = await fetch(`https://overpass-api.de/api/interpreter?data=${encodeURIComponent(query)}`);
+    
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    
+    const data = await response.json();
+
+    const rawHospitals = data.elements.map((el) => {
+      const hospitalCoords = el.lat ? [el.lat, el.lon] : [el.center.lat, el.center.lon];
+      const distance = calculateDistance(lat, lon, hospitalCoords[0], hospitalCoords[1]);
+      
+      return {
+        id: el.id,
+        name: el.tags?.name || 'Unnamed Hospital',
+        coords: hospitalCoords,
+        distance: distance,
+        duration: null,
+        loading: false,
+        address: el.tags?.['addr:full'] || el.tags?.['addr:street'] || el.tags?.['addr:city'] || 'Address not available',
+        website: el.tags?.website || null
+      };
+    });
 
-      setHospitals(rawHospitals);
+    // Sort hospitals by distance (closest first)
+    rawHospitals.sort((a, b) => a.distance - b.distance);
+    return rawHospitals;
+  };
+
+  const fetchHospitals = async (coords) => {
+    try {
+      setLoading(true);
+      const nearby = await fetchNearbyFromBackend(coords);
+      setHospitals(nearby !== null ? nearby : await fetchNearbyFromOverpass(coords));
       setLoading(false);
     } catch (error) {
       console.error('Error fetching hospitals:', error);
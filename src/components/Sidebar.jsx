@@ -92,7 +92,7 @@ const Sidebar = ({ onSelectSession, activeSessionId }) => {
               >
                 <div className="session-header">
                   <div className="session-title">
-                    Chat {session.session_id.substring(0, 8)}...
+                    {session.title || `Chat ${session.session_id.substring(0, 8)}...`}
                   </div>
                   <button 
                     className="delete-session-btn"